@@ -7,8 +7,8 @@ import logging
 from pathlib import Path
 from datetime import datetime
 
-from config import config
-from services import DocumentService, RAGService, SessionService
+from config import config, configure_logging
+from services import DocumentService, RAGService, SessionService, IngestService
 from src.query_classifier import QueryClassifier
 
 # Configure page
@@ -20,22 +20,35 @@ st.set_page_config(
 )
 
 # Configure logging
-logging.basicConfig(
-    level=getattr(logging, config.LOG_LEVEL),
-    format=config.LOG_FORMAT
-)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 
 # ==================== CACHED RESOURCES ====================
 
+@st.cache_resource
+def load_embedding_manager():
+    """Load the embedding model once, independently of other services"""
+    return RAGService.create_embedding_manager()
+
+
+@st.cache_resource
+def load_llm():
+    """Create the Gemini client once, independently of other services"""
+    return RAGService.create_llm()
+
+
 @st.cache_resource
 def initialize_services():
     """Initialize services once and cache"""
     try:
-        doc_service = DocumentService()
-        rag_service = RAGService()
         session_service = SessionService()
+        doc_service = DocumentService(session_service=session_service)
+        rag_service = RAGService(
+            embedding_manager=load_embedding_manager(),
+            llm=load_llm()
+        )
+        ingest_service = IngestService(rag_service)
 
         # Validate configuration
         is_valid, error = config.validate()
@@ -44,7 +57,7 @@ def initialize_services():
             st.stop()
 
         logger.info("Services initialized successfully")
-        return doc_service, rag_service, session_service
+        return doc_service, rag_service, session_service, ingest_service
 
     except Exception as e:
         logger.error(f"Failed to initialize services: {e}", exc_info=True)
@@ -52,11 +65,70 @@ def initialize_services():
         st.stop()
 
 
-doc_service, rag_service, session_service = initialize_services()
+doc_service, rag_service, session_service, ingest_service = initialize_services()
 
 # Initialize query classifier for routing
 query_classifier = QueryClassifier()
 
+
+_SOURCE_TEMPLATE = (
+    "**Source {index}** (Similarity: {similarity:.2%})\n"
+    "- **File:** {file}\n"
+    "- **Page:** {page}\n"
+    "\n"
+    "*{preview}...*\n"
+)
+
+
+def render_sources(sources: list) -> str:
+    """Render a sources list to markdown once, for reuse on every rerun"""
+    return "\n".join(
+        _SOURCE_TEMPLATE.format(
+            index=i,
+            similarity=source.get('similarity', 0),
+            file=source.get('source_file', 'Unknown'),
+            page=source.get('page', 'N/A'),
+            preview=source.get('content', '')[:200],
+        )
+        for i, source in enumerate(sources, 1)
+    )
+
+
+def stream_rag_answer(question: str, collection_name: str, sources: list):
+    """
+    Yield answer text from RAGService.query_stream for st.write_stream
+
+    Retrieved sources arrive before the first token; they are appended to
+    `sources` so the caller can render them once streaming has finished.
+    """
+    for event in rag_service.query_stream(
+        question=question,
+        collection_name=collection_name,
+        top_k=config.TOP_K_RESULTS
+    ):
+        if event["type"] == "sources":
+            sources.extend(event["sources"])
+        elif event["type"] == "token":
+            yield event["text"]
+        elif event["type"] == "error":
+            sources.clear()
+            yield f"❌ Error: {event['error']}"
+
+
+def stream_chat_answer(question: str):
+    """Yield direct LLM chat text from RAGService.chat_stream for st.write_stream"""
+    try:
+        yield from rag_service.chat_stream(question)
+    except Exception as e:
+        logger.error(f"Error during chat: {e}", exc_info=True)
+        yield f"❌ Error: Error during chat: {str(e)}"
+
+
+@st.cache_data(ttl=5, show_spinner=False)
+def get_cached_session_stats(session_id: str):
+    """Session stats for the sidebar, cached briefly across reruns"""
+    return session_service.get_session_stats(session_id)
+
 # ==================== SESSION MANAGEMENT ====================
 
 def init_session_state():
@@ -85,8 +157,16 @@ collection_name = session_service.get_collection_name(session_id) if config.USE_
 
 # ==================== UI LAYOUT ====================
 
-# Sidebar
-with st.sidebar:
+# Seconds between sidebar refreshes while documents are being ingested
+INGEST_POLL_SECONDS = 2
+
+
+# Sidebar (a fragment, so upload interactions rerun only the sidebar). It
+# re-runs itself on a timer while ingest jobs are pending; the decorator is
+# re-evaluated on every full app run, which is how polling starts and stops.
+@st.fragment(run_every=INGEST_POLL_SECONDS if ingest_service.get_jobs(session_id) else None)
+def sidebar_ui():
+    """Render the sidebar: uploads, loaded documents, stats and session controls"""
     st.title("🤖 AI Assistant")
     st.caption("💬 Chat mode + 🔍 Document search")
     st.markdown("---")
@@ -94,17 +174,19 @@ with st.sidebar:
     # File Upload Section
     st.header("📄 Upload Documents")
 
-    uploaded_file = st.file_uploader(
+    uploaded_files = st.file_uploader(
         "Upload PDF, TXT, or DOCX",
         type=["pdf", "txt", "docx"],
         help=f"Max size: {config.MAX_FILE_SIZE_MB}MB",
+        accept_multiple_files=True,
         key="file_uploader"
     )
 
-    if uploaded_file:
-        if st.button("🚀 Process Document", type="primary", use_container_width=True):
-            with st.spinner("Processing document..."):
-                # Save file
+    if uploaded_files:
+        if st.button("🚀 Process Documents", type="primary", use_container_width=True):
+            # Save files and hand them to the background ingest worker
+            queued = 0
+            for uploaded_file in uploaded_files:
                 file_path, error = doc_service.save_uploaded_file(
                     uploaded_file,
                     uploaded_file.name,
@@ -112,38 +194,50 @@ with st.sidebar:
                 )
 
                 if error:
-                    st.error(f"Upload failed: {error}")
+                    st.error(f"Upload failed for {uploaded_file.name}: {error}")
                 else:
-                    # Process document
-                    progress_bar = st.progress(0, text="Extracting text...")
-
-                    progress_bar.progress(33, text="Generating embeddings...")
-                    doc_count, error = rag_service.process_document(
-                        file_path,
-                        collection_name
-                    )
-
-                    if error:
-                        st.error(f"Processing failed: {error}")
-                    else:
-                        progress_bar.progress(100, text="Complete!")
-
-                        # Update session
-                        session_service.add_file_to_session(
-                            session_id,
-                            uploaded_file.name,
-                            doc_count
-                        )
-
-                        # Track uploaded file
-                        st.session_state.uploaded_files_info.append({
-                            "filename": uploaded_file.name,
-                            "chunks": doc_count,
-                            "uploaded_at": datetime.now().strftime("%H:%M:%S")
-                        })
-
-                        st.success(f"✅ Processed {doc_count} chunks from {uploaded_file.name}")
-                        st.rerun()
+                    ingest_service.submit(session_id, file_path, uploaded_file.name, collection_name)
+                    queued += 1
+
+            if queued:
+                # Full rerun so the fragment is rebuilt with a polling interval
+                st.rerun()
+
+    # Collect results from the background ingest worker
+    finished_jobs = ingest_service.pop_finished(session_id)
+    notices = st.session_state.setdefault("ingest_notices", [])
+    for job in finished_jobs:
+        if job["status"] == "error":
+            notices.append(("error", f"Processing failed for {job['filename']}: {job['error']}"))
+            continue
+
+        # Update session
+        session_service.add_file_to_session(
+            session_id,
+            job["filename"],
+            job["chunks"]
+        )
+        get_cached_session_stats.clear()
+
+        # Track uploaded file
+        st.session_state.uploaded_files_info.append({
+            "filename": job["filename"],
+            "chunks": job["chunks"],
+            "uploaded_at": datetime.now().strftime("%H:%M:%S")
+        })
+
+        notices.append(("success", f"✅ Processed {job['chunks']} chunks from {job['filename']}"))
+
+    pending_jobs = ingest_service.get_jobs(session_id)
+    if finished_jobs and not pending_jobs:
+        # Everything is done: full rerun to stop polling and refresh the chat area
+        st.rerun()
+
+    for kind, text in st.session_state.pop("ingest_notices", []):
+        getattr(st, kind)(text)
+
+    for job in pending_jobs:
+        st.caption(f"⏳ {job['filename']}: {job['status']}")
 
     st.markdown("---")
 
@@ -162,7 +256,7 @@ with st.sidebar:
 
     # Session Stats
     if session_data:
-        stats = session_service.get_session_stats(session_id)
+        stats = get_cached_session_stats(session_id)
         st.header("📊 Session Stats")
         st.metric("Documents", stats["document_count"])
         st.metric("Queries", stats["query_count"])
@@ -173,7 +267,8 @@ with st.sidebar:
         if config.USE_SESSION_COLLECTIONS:
             rag_service.delete_collection(collection_name)
 
-        # Clear uploaded files
+        # Clear uploaded files and any queued ingest jobs
+        ingest_service.discard_session(session_id)
         doc_service.cleanup_session_files(session_id)
 
         # Reset session state
@@ -200,6 +295,10 @@ with st.sidebar:
                 st.write(f"{component}: {'✅' if status else '❌'}")
 
 
+with st.sidebar:
+    sidebar_ui()
+
+
 # ==================== MAIN CHAT INTERFACE ====================
 
 st.title("💬 Chat & Document Q&A")
@@ -211,17 +310,9 @@ for message in st.session_state.messages:
         st.markdown(message["content"])
 
         # Display sources if available
-        if message["role"] == "assistant" and "sources" in message:
-            if message["sources"]:
-                with st.expander("📎 Sources", expanded=False):
-                    for i, source in enumerate(message["sources"], 1):
-                        st.markdown(f"""
-                        **Source {i}** (Similarity: {source.get('similarity', 0):.2%})
-                        - **File:** {source.get('source_file', 'Unknown')}
-                        - **Page:** {source.get('page', 'N/A')}
-
-                        *{source.get('content', '')[:200]}...*
-                        """)
+        if message["role"] == "assistant" and message.get("_rendered_sources"):
+            with st.expander("📎 Sources", expanded=False):
+                st.markdown(message["_rendered_sources"])
 
 # Chat input
 if prompt := st.chat_input("Ask me anything or search your documents..."):
@@ -233,72 +324,53 @@ if prompt := st.chat_input("Ask me anything or search your documents..."):
 
     # Generate response
     with st.chat_message("assistant"):
-        with st.spinner("Thinking..."):
-            # Automatically classify query to determine routing
-            use_rag = query_classifier.should_use_rag(prompt)
-
-            # Check if RAG requested but no documents uploaded
-            if use_rag and not st.session_state.uploaded_files_info and config.USE_SESSION_COLLECTIONS:
-                answer = "⚠️ I detected you want to search documents, but no documents are uploaded yet. Please upload a PDF first, or rephrase your question for general chat!"
-                sources = []
-                result = {"mode": "llm"}
-            elif use_rag:
-                # Use RAG pipeline - search in documents
-                result = rag_service.query(
-                    question=prompt,
-                    collection_name=collection_name,
-                    top_k=config.TOP_K_RESULTS
-                )
-
-                if result["error"]:
-                    answer = f"❌ Error: {result['error']}"
-                    sources = []
-                elif not result["answer"]:
-                    answer = "I couldn't find relevant information in the uploaded documents to answer this question."
-                    sources = []
-                else:
-                    answer = result["answer"]
-                    sources = result["sources"]
-            else:
-                # Use direct LLM - normal conversational AI
-                result = rag_service.chat(question=prompt)
-
-                if result["error"]:
-                    answer = f"❌ Error: {result['error']}"
-                elif not result["answer"]:
-                    answer = "I couldn't generate a response."
-                else:
-                    answer = result["answer"]
-                sources = []
+        # Automatically classify query to determine routing
+        use_rag = query_classifier.should_use_rag(prompt)
 
-            # Update query count
-            session_service.increment_query_count(session_id)
-
-            # Display answer
+        # Check if RAG requested but no documents uploaded
+        if use_rag and not st.session_state.uploaded_files_info and config.USE_SESSION_COLLECTIONS:
+            answer = "⚠️ I detected you want to search documents, but no documents are uploaded yet. Please upload a PDF first, or rephrase your question for general chat!"
             st.markdown(answer)
-
-            # Display mode indicator (subtle)
-            mode_emoji = "🔍" if result.get("mode") == "rag" else "💬"
-            mode_text = "Document Search" if result.get("mode") == "rag" else "General Chat"
-            st.caption(f"{mode_emoji} {mode_text}")
-
-            # Display sources (only for RAG)
-            if sources:
-                with st.expander("📎 Sources", expanded=False):
-                    for i, source in enumerate(sources, 1):
-                        st.markdown(f"""
-                        **Source {i}** (Similarity: {source.get('similarity', 0):.2%})
-                        - **File:** {source.get('source_file', 'Unknown')}
-                        - **Page:** {source.get('page', 'N/A')}
-
-                        *{source.get('content', '')[:200]}...*
-                        """)
+            sources = []
+            mode = "llm"
+        elif use_rag:
+            # Use RAG pipeline - search in documents, streaming the answer
+            sources = []
+            mode = "rag"
+            answer = st.write_stream(stream_rag_answer(prompt, collection_name, sources))
+            if not answer:
+                answer = "I couldn't find relevant information in the uploaded documents to answer this question."
+                st.markdown(answer)
+        else:
+            # Use direct LLM - normal conversational AI, streaming the answer
+            sources = []
+            mode = "llm"
+            answer = st.write_stream(stream_chat_answer(prompt))
+            if not answer:
+                answer = "I couldn't generate a response."
+                st.markdown(answer)
+
+        # Update query count
+        session_service.increment_query_count(session_id)
+        get_cached_session_stats.clear()
+
+        # Display mode indicator (subtle)
+        mode_emoji = "🔍" if mode == "rag" else "💬"
+        mode_text = "Document Search" if mode == "rag" else "General Chat"
+        st.caption(f"{mode_emoji} {mode_text}")
+
+        # Display sources (only for RAG)
+        rendered_sources = render_sources(sources)
+        if rendered_sources:
+            with st.expander("📎 Sources", expanded=False):
+                st.markdown(rendered_sources)
 
     # Save assistant message
     st.session_state.messages.append({
         "role": "assistant",
         "content": answer,
-        "sources": sources
+        "sources": sources,
+        "_rendered_sources": rendered_sources
     })
 
 
@@ -2,6 +2,7 @@
 Production Configuration Management
 Centralized config with environment-specific settings
 """
+import logging
 import os
 from pathlib import Path
 from dotenv import load_dotenv
@@ -25,15 +26,31 @@ class Config:
 
     # RAG Configuration
     EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+    EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")  # torch or onnx
+    ONNX_MODEL_DIR = DATA_DIR / "onnx_models"
+    EMBEDDING_TORCH_COMPILE = os.getenv("EMBEDDING_TORCH_COMPILE", "false").lower() == "true"  # CUDA only
+    # Persist embeddings on disk keyed by sha256(text); one small file per distinct text
+    EMBEDDING_DISK_CACHE = os.getenv("EMBEDDING_DISK_CACHE", "false").lower() == "true"
+    EMBEDDING_CACHE_DIR = DATA_DIR / "embedding_cache"
     CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
     CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+    MIN_CHUNK_CHARS = int(os.getenv("MIN_CHUNK_CHARS", "400"))  # Smaller chunks are merged into neighbours
+    MAX_CHUNK_CHARS = int(os.getenv("MAX_CHUNK_CHARS", str(int(CHUNK_SIZE * 1.15))))
     TOP_K_RESULTS = int(os.getenv("TOP_K_RESULTS", "3"))
+    MIN_SIMILARITY = float(os.getenv("MIN_SIMILARITY", "0.25"))  # Below this best-chunk score, skip the LLM
 
     # LLM Configuration
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
     GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
     LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.1"))
     LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "500"))
+    LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "128"))  # Identical-prompt response cache, 0 disables
+    ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))  # Per-collection answer cache, 0 disables
+    SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "0"))  # Paraphrase cache entries, 0 disables (opt-in)
+    SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))  # Cosine similarity for a hit
+    GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "10"))  # In-flight async requests
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))  # Attempts for 429/5xx/timeouts
+    LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "1.0"))  # Seconds, doubled per attempt
 
     # File Upload Configuration
     MAX_FILE_SIZE_MB = int(os.getenv("MAX_FILE_SIZE_MB", "10"))
@@ -45,8 +62,13 @@ class Config:
     USE_SESSION_COLLECTIONS = os.getenv("USE_SESSION_COLLECTIONS", "true").lower() == "true"
 
     # Performance
-    ENABLE_CACHING = os.getenv("ENABLE_CACHING", "true").lower() == "true"
-    BATCH_SIZE = int(os.getenv("BATCH_SIZE", "32"))
+    ENABLE_CACHING = os.getenv("ENABLE_CACHING", "true").lower() == "true"  # false disables LLM and answer caches
+    BATCH_SIZE = int(os.getenv("BATCH_SIZE", "0"))  # Embedding batch size, 0 = auto (128 GPU / 32 CPU)
+    INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "200"))  # Chunks per ChromaDB add call
+    # Disable SQLite journaling/fsync during ingest; only for re-ingestable sources
+    BULK_INGEST_UNSAFE = os.getenv("BULK_INGEST_UNSAFE", "false").lower() == "true"
+    ENABLE_INT8_INDEX = os.getenv("ENABLE_INT8_INDEX", "false").lower() == "true"  # int8 shadow index for retrieval
+    MAX_CONCURRENT_BATCHES = int(os.getenv("MAX_CONCURRENT_BATCHES", "2"))  # Parallel multi-file ingests
 
     # Logging
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
@@ -72,6 +94,7 @@ class Config:
         """Get configuration summary (safe for logging)"""
         return {
             "embedding_model": cls.EMBEDDING_MODEL,
+            "embedding_backend": cls.EMBEDDING_BACKEND,
             "chunk_size": cls.CHUNK_SIZE,
             "chunk_overlap": cls.CHUNK_OVERLAP,
             "top_k": cls.TOP_K_RESULTS,
@@ -98,3 +121,11 @@ class ProductionConfig(Config):
 # Select config based on environment
 ENV = os.getenv("ENVIRONMENT", "development").lower()
 config = ProductionConfig if ENV == "production" else DevelopmentConfig
+
+
+def configure_logging():
+    """Configure root logging from config; call once from the app entrypoint"""
+    logging.basicConfig(
+        level=getattr(logging, config.LOG_LEVEL),
+        format=config.LOG_FORMAT
+    )
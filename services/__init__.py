@@ -4,5 +4,6 @@ Services Layer - Business logic and orchestration
 from .document_service import DocumentService
 from .rag_service import RAGService
 from .session_service import SessionService
+from .ingest_service import IngestService
 
-__all__ = ["DocumentService", "RAGService", "SessionService"]
+__all__ = ["DocumentService", "RAGService", "SessionService", "IngestService"]
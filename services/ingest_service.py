@@ -0,0 +1,123 @@
+"""
+Ingest Service - Background document ingestion queue
+Decouples upload clicks from embedding so uploads never block the UI
+"""
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+class IngestService:
+    """Producer/consumer queue feeding RAGService.process_documents_batch"""
+
+    def __init__(self, rag_service, max_queue_size: int = 256, max_batch_files: int = 64, max_wait: float = 2.0):
+        """
+        Start the background ingest worker
+
+        Args:
+            rag_service: RAGService used to embed and index documents
+            max_queue_size: Maximum number of queued files before submit blocks
+            max_batch_files: Maximum number of files embedded in one pass
+            max_wait: Seconds to wait for more files before flushing a batch
+        """
+        self.rag_service = rag_service
+        self.max_batch_files = max_batch_files
+        self.max_wait = max_wait
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._jobs: Dict[str, Dict[str, dict]] = defaultdict(dict)
+        self._lock = threading.Lock()
+
+        self._worker = threading.Thread(target=self._run, name="ingest-worker", daemon=True)
+        self._worker.start()
+        logger.info("Ingest worker started")
+
+    def submit(self, session_id: str, file_path: Path, original_name: str, collection_name: str):
+        """Queue a saved file for embedding and indexing"""
+        with self._lock:
+            self._jobs[session_id][str(file_path)] = {
+                "filename": original_name,
+                "status": "queued",
+                "chunks": None,
+                "error": None,
+            }
+        self._queue.put((session_id, file_path, collection_name))
+        logger.info(f"Queued for ingest: {file_path.name} (session {session_id})")
+
+    def get_jobs(self, session_id: str) -> List[dict]:
+        """Snapshot of all tracked jobs for a session"""
+        with self._lock:
+            return [dict(job) for job in self._jobs.get(session_id, {}).values()]
+
+    def pop_finished(self, session_id: str) -> List[dict]:
+        """Remove and return jobs for a session that are done or failed"""
+        with self._lock:
+            jobs = self._jobs.get(session_id, {})
+            finished = [key for key, job in jobs.items() if job["status"] in ("done", "error")]
+            return [jobs.pop(key) for key in finished]
+
+    def discard_session(self, session_id: str):
+        """Forget all tracked jobs for a session"""
+        with self._lock:
+            self._jobs.pop(session_id, None)
+
+    def _drain(self) -> list:
+        """Block for one item, then collect more until the batch is full or max_wait elapses"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_files:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _set_status(self, session_id: str, key: str, **fields):
+        with self._lock:
+            job = self._jobs.get(session_id, {}).get(key)
+            if job is not None:
+                job.update(fields)
+
+    def _run(self):
+        """Worker loop: drain, group by session and collection, embed each group in one pass"""
+        while True:
+            batch = self._drain()
+
+            # Grouping by session too keeps one user's failed batch from
+            # failing another user's files when collections are shared
+            groups: Dict[tuple, list] = defaultdict(list)
+            for session_id, file_path, collection_name in batch:
+                groups[(session_id, collection_name)].append(file_path)
+
+            for (session_id, collection_name), file_paths in groups.items():
+                for file_path in file_paths:
+                    self._set_status(session_id, str(file_path), status="processing")
+
+                try:
+                    file_results, error = self.rag_service.process_documents_batch(
+                        file_paths,
+                        collection_name
+                    )
+                except Exception as e:
+                    logger.error(f"Ingest batch failed: {e}", exc_info=True)
+                    file_results, error = None, str(e)
+
+                for file_path in file_paths:
+                    key = str(file_path)
+                    chunks, file_error = (None, error) if error else file_results[key]
+                    if file_error:
+                        self._set_status(session_id, key, status="error", error=file_error)
+                    else:
+                        self._set_status(session_id, key, status="done", chunks=chunks)
+
+            for _ in batch:
+                self._queue.task_done()
@@ -3,42 +3,62 @@ RAG Service - Orchestrates document processing and query pipeline
 Integrates with existing RAG modules with production-grade error handling
 """
 import logging
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
+from typing import Iterator, List, Dict, Optional, Tuple
 import traceback
 import numpy as np
 
 from config import config
 from src import (
-    PDFDocumentLoader,
     EmbeddingManager,
+    EmbeddingBatcher,
     VectorStore,
     RAGRetriever,
     GeminiLLM,
     RAGPipeline
 )
 
-logging.basicConfig(
-    level=getattr(logging, config.LOG_LEVEL),
-    format=config.LOG_FORMAT
-)
 logger = logging.getLogger(__name__)
 
+# Questions about the current date/time get today's date injected into the prompt
+_TIME_QUERY_RE = re.compile(
+    r"\b(?:today|date|what day|current date|what'?s the date|time|now|current time)\b",
+    re.IGNORECASE
+)
+
 
 class RAGService:
     """High-level service for RAG operations"""
 
-    def __init__(self):
-        """Initialize RAG components"""
+    def __init__(self, embedding_manager: EmbeddingManager = None, llm: GeminiLLM = None):
+        """
+        Initialize RAG components
+
+        Args:
+            embedding_manager: Preloaded EmbeddingManager (built from config if None)
+            llm: Preloaded GeminiLLM (built from config if None)
+        """
         try:
-            # Initialize components (cached for performance)
-            self.embedding_manager = EmbeddingManager(model_name=config.EMBEDDING_MODEL)
-            self.llm = GeminiLLM(
-                model_name=config.GEMINI_MODEL,
-                api_key=config.GEMINI_API_KEY,
-                temperature=config.LLM_TEMPERATURE,
-                max_output_tokens=config.LLM_MAX_TOKENS
-            )
+            # Components can be injected so callers can cache them independently
+            self.embedding_manager = embedding_manager or self.create_embedding_manager()
+            self.llm = llm or self.create_llm()
+
+            # Shared by all retrievers so concurrent queries share forward passes
+            self.query_batcher = EmbeddingBatcher(self.embedding_manager)
+
+            # Per-collection handles, reused across calls
+            self._vector_stores: Dict[str, VectorStore] = {}
+            self._pipelines: Dict[str, RAGPipeline] = {}
+            self._cache_lock = threading.Lock()
+
+            # Caps how many multi-file ingests hold chunks/embeddings in memory at once
+            self._batch_slots = threading.BoundedSemaphore(config.MAX_CONCURRENT_BATCHES)
 
             logger.info("RAG Service initialized successfully")
             logger.info(f"Config: {config.get_summary()}")
@@ -47,6 +67,189 @@ class RAGService:
             logger.error(f"Failed to initialize RAG Service: {e}", exc_info=True)
             raise
 
+    @staticmethod
+    def create_embedding_manager() -> EmbeddingManager:
+        """Build the embedding manager from config"""
+        return EmbeddingManager(
+            model_name=config.EMBEDDING_MODEL,
+            backend=config.EMBEDDING_BACKEND,
+            onnx_cache_dir=str(config.ONNX_MODEL_DIR),
+            background_load=True,
+            batch_size=config.BATCH_SIZE or None,
+            compile_model=config.EMBEDDING_TORCH_COMPILE,
+            cache_dir=str(config.EMBEDDING_CACHE_DIR) if config.EMBEDDING_DISK_CACHE else None
+        )
+
+    @staticmethod
+    def create_llm() -> GeminiLLM:
+        """Build the Gemini LLM client from config"""
+        return GeminiLLM(
+            model_name=config.GEMINI_MODEL,
+            api_key=config.GEMINI_API_KEY,
+            temperature=config.LLM_TEMPERATURE,
+            max_output_tokens=config.LLM_MAX_TOKENS,
+            cache_size=config.LLM_CACHE_SIZE if config.ENABLE_CACHING else 0,
+            max_concurrency=config.GEMINI_MAX_CONCURRENCY,
+            max_retries=config.LLM_MAX_RETRIES,
+            retry_base_delay=config.LLM_RETRY_BASE_DELAY
+        )
+
+    def _get_vector_store(self, collection_name: str) -> VectorStore:
+        """Get the cached VectorStore for a collection, opening it on first use"""
+        with self._cache_lock:
+            vector_store = self._vector_stores.get(collection_name)
+            if vector_store is None:
+                vector_store = VectorStore(
+                    collection_name=collection_name,
+                    persist_directory=str(config.VECTOR_STORE_DIR),
+                    int8_index=config.ENABLE_INT8_INDEX
+                )
+                self._vector_stores[collection_name] = vector_store
+            return vector_store
+
+    def _get_pipeline(self, collection_name: str) -> RAGPipeline:
+        """Get the cached RAGPipeline (retriever + LLM) for a collection"""
+        vector_store = self._get_vector_store(collection_name)
+        with self._cache_lock:
+            pipeline = self._pipelines.get(collection_name)
+            if pipeline is None:
+                retriever = RAGRetriever(
+                    vector_store=vector_store,
+                    embedding_manager=self.embedding_manager,
+                    batcher=self.query_batcher
+                )
+                pipeline = RAGPipeline(
+                    retriever=retriever,
+                    llm=self.llm,
+                    cache_size=config.ANSWER_CACHE_SIZE if config.ENABLE_CACHING else 0,
+                    sem_threshold=config.SEMANTIC_CACHE_THRESHOLD,
+                    sem_cache_size=config.SEMANTIC_CACHE_SIZE if config.ENABLE_CACHING else 0,
+                    min_similarity=config.MIN_SIMILARITY
+                )
+                self._pipelines[collection_name] = pipeline
+            return pipeline
+
+    def _add_in_batches(self, vector_store: VectorStore, documents: List, embeddings: np.ndarray) -> None:
+        """Add documents to ChromaDB in INGEST_BATCH_SIZE slices (views, no copies)"""
+        batch_size = config.INGEST_BATCH_SIZE
+        for start in range(0, len(documents), batch_size):
+            # VectorStore.add_documents expects (documents, embeddings)
+            vector_store.add_documents(
+                documents=documents[start:start + batch_size],
+                embeddings=embeddings[start:start + batch_size]
+            )
+
+        # New chunks can change answers, so drop the collection's cached ones
+        with self._cache_lock:
+            pipeline = self._pipelines.get(vector_store.collection_name)
+        if pipeline is not None:
+            pipeline.clear_cache()
+
+    def _embed_and_store_pipelined(self, batches: Iterator[List], vector_store: VectorStore, max_in_flight: int = 2) -> None:
+        """
+        Embed and store chunk batches with the three stages overlapped
+
+        The calling thread loads/splits the next batch while one worker
+        embeds the previous batch and another inserts the one before that
+        (torch and SQLite both release the GIL). At most max_in_flight
+        batches wait for insertion, which bounds memory.
+
+        Args:
+            batches: Iterator of chunk Document lists
+            vector_store: Destination VectorStore
+            max_in_flight: Maximum batches embedded but not yet stored
+        """
+        def store(documents, embeddings_future):
+            # documents are already LangChain Document objects from text_splitter
+            self._add_in_batches(vector_store, documents, embeddings_future.result())
+
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-embed") as embed_pool, \
+                ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-store") as store_pool:
+            # Bulk-ingest PRAGMAs are per connection and ChromaDB keeps one per
+            # thread, so enter the mode once on the (single) store thread
+            bulk_mode = ExitStack()
+            store_pool.submit(
+                bulk_mode.enter_context,
+                vector_store.bulk_ingest_mode(unsafe=config.BULK_INGEST_UNSAFE)
+            ).result()
+
+            try:
+                pending = deque()
+                for documents in batches:
+                    texts = [doc.page_content for doc in documents]
+                    embeddings_future = embed_pool.submit(self.embedding_manager.generate_embeddings, texts)
+                    pending.append(store_pool.submit(store, documents, embeddings_future))
+
+                    # Wait for the oldest insert before reading further ahead
+                    while len(pending) > max_in_flight:
+                        pending.popleft().result()
+
+                for future in pending:
+                    future.result()
+            finally:
+                store_pool.submit(bulk_mode.close).result()
+
+    _NO_PAGES_ERROR = "No content extracted from PDF. The file may be image-based, encrypted, or corrupted."
+    _NO_CHUNKS_ERROR = "Document loaded but no text chunks created after splitting"
+
+    def _iter_chunk_batches(self, file_path: Path, stats: Dict[str, int]) -> Iterator[List]:
+        """
+        Stream a document page by page, yielding chunk batches
+
+        Pages are split as they are read, so only about INGEST_BATCH_SIZE
+        chunks are held at a time instead of every page plus every chunk.
+
+        Args:
+            file_path: Path to document file
+            stats: Filled with "pages" and "chunks" counts as batches are produced
+
+        Yields:
+            Lists of chunk Documents
+        """
+        # Load PDF directly (bypassing directory-based loader)
+        from langchain_community.document_loaders import PyPDFLoader
+        from src.data_loader import create_text_splitter, refine_chunks
+
+        text_splitter = create_text_splitter(
+            chunk_size=config.CHUNK_SIZE,
+            chunk_overlap=config.CHUNK_OVERLAP
+        )
+
+        # Add source metadata (same for every page, so computed once)
+        source_metadata = {
+            'source_file': file_path.name,
+            'file_type': file_path.suffix[1:].lower(),  # pdf, txt, etc.
+        }
+
+        stats["pages"] = stats["chunks"] = 0
+        pending = []
+
+        def flush():
+            # Merge tiny chunks and re-split oversized ones
+            refined = refine_chunks(
+                pending,
+                text_splitter,
+                min_chars=config.MIN_CHUNK_CHARS,
+                max_chars=config.MAX_CHUNK_CHARS,
+                chunk_overlap=config.CHUNK_OVERLAP
+            )
+            stats["chunks"] += len(refined)
+            return refined
+
+        for page in PyPDFLoader(str(file_path)).lazy_load():
+            stats["pages"] += 1
+            page.metadata.update(source_metadata)
+            pending.extend(text_splitter.split_documents([page]))
+
+            if len(pending) >= config.INGEST_BATCH_SIZE:
+                yield flush()
+                pending = []
+
+        if pending:
+            yield flush()
+
+        logger.info(f"Split {stats['pages']} pages into {stats['chunks']} chunks from {file_path.name}")
+
     def process_document(
         self,
         file_path: Path,
@@ -65,73 +268,134 @@ class RAGService:
         try:
             logger.info(f"Processing document: {file_path.name}")
 
-            # Step 1: Load PDF directly (bypassing directory-based loader)
-            from langchain_community.document_loaders import PyPDFLoader
-            from langchain_text_splitters import RecursiveCharacterTextSplitter
+            # Stream the document: load -> split -> embed -> store, one batch at a time
+            vector_store = self._get_vector_store(collection_name)
+            stats: Dict[str, int] = {}
 
-            # Load PDF pages
-            pdf_loader = PyPDFLoader(str(file_path))
-            raw_documents = pdf_loader.load()
-
-            if not raw_documents:
-                return None, "No content extracted from PDF. The file may be image-based, encrypted, or corrupted."
-
-            logger.info(f"Loaded {len(raw_documents)} pages from {file_path.name}")
-
-            # Add source metadata
-            for doc in raw_documents:
-                doc.metadata['source_file'] = file_path.name
-                doc.metadata['file_type'] = file_path.suffix[1:]  # pdf, txt, etc.
-
-            # Split into chunks
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=config.CHUNK_SIZE,
-                chunk_overlap=config.CHUNK_OVERLAP,
-                length_function=len,
-                separators=["\n\n", "\n", " ", ""]
+            self._embed_and_store_pipelined(
+                self._iter_chunk_batches(file_path, stats),
+                vector_store
             )
 
-            documents = text_splitter.split_documents(raw_documents)
+            if not stats["pages"]:
+                return None, self._NO_PAGES_ERROR
+            if not stats["chunks"]:
+                return None, self._NO_CHUNKS_ERROR
 
-            if not documents:
-                return None, "Document loaded but no text chunks created after splitting"
+            logger.info(f"Successfully indexed {stats['chunks']} chunks to collection '{collection_name}'")
 
-            logger.info(f"Split into {len(documents)} chunks from {file_path.name}")
+            return stats["chunks"], None
 
-            # Step 2: Generate embeddings
-            texts = [doc.page_content for doc in documents]
-            metadata = [doc.metadata for doc in documents]
+        except FileNotFoundError:
+            error_msg = f"File not found: {file_path}"
+            logger.error(error_msg)
+            return None, error_msg
 
-            embeddings = self.embedding_manager.generate_embeddings(texts)
-            logger.info(f"Generated {len(embeddings)} embeddings")
+        except Exception as e:
+            error_msg = f"Error processing document: {str(e)}"
+            logger.error(error_msg, exc_info=True)
+            return None, error_msg
 
-            # Step 3: Store in ChromaDB
-            vector_store = VectorStore(
-                collection_name=collection_name,
-                persist_directory=str(config.VECTOR_STORE_DIR)
-            )
+    def process_documents_batch(
+        self,
+        file_paths: List[Path],
+        collection_name: str = "pdf_documents"
+    ) -> Tuple[Optional[Dict[str, Tuple[Optional[int], Optional[str]]]], Optional[str]]:
+        """
+        Process several documents through one streamed ingest
 
-            # VectorStore.add_documents expects (documents, embeddings)
-            # documents are already LangChain Document objects from text_splitter
-            vector_store.add_documents(
-                documents=documents,
-                embeddings=np.array(embeddings)
-            )
+        Files are read page by page and their chunks are packed into shared
+        INGEST_BATCH_SIZE batches, so small files still embed in bulk while
+        memory stays bounded. pypdf parsing (pure Python, holds the GIL)
+        runs on the calling thread and overlaps with embedding and inserts
+        on worker threads. A file that fails to load is reported in its own
+        result; the other files are still indexed.
 
-            logger.info(f"Successfully indexed {len(documents)} chunks to collection '{collection_name}'")
+        Args:
+            file_paths: Paths to document files
+            collection_name: ChromaDB collection name
 
-            return len(documents), None
+        Returns:
+            ({str(file_path): (chunk_count, error_message)}, error_message),
+            where the outer error_message means the whole batch failed
+        """
+        if not file_paths:
+            return {}, None
 
-        except FileNotFoundError:
-            error_msg = f"File not found: {file_path}"
+        try:
+            with self._batch_slots:
+                return self._process_documents_batch(file_paths, collection_name)
+
+        except FileNotFoundError as e:
+            error_msg = f"File not found: {e.filename}"
             logger.error(error_msg)
             return None, error_msg
 
         except Exception as e:
-            error_msg = f"Error processing document: {str(e)}"
+            error_msg = f"Error processing documents: {str(e)}"
             logger.error(error_msg, exc_info=True)
             return None, error_msg
 
+    def _process_documents_batch(
+        self,
+        file_paths: List[Path],
+        collection_name: str
+    ) -> Tuple[Optional[Dict[str, Tuple[Optional[int], Optional[str]]]], Optional[str]]:
+        """Stream every file through load -> split -> embed -> store, sharing embedding batches"""
+        logger.info(f"Processing {len(file_paths)} documents in one batch")
+
+        vector_store = self._get_vector_store(collection_name)
+        file_results: Dict[str, Tuple[Optional[int], Optional[str]]] = {}
+        partially_stored: List[Path] = []
+
+        def chunk_batches() -> Iterator[List]:
+            # Chunks from consecutive files are packed into the same
+            # INGEST_BATCH_SIZE batches so small files still embed in bulk
+            pending = []
+            for file_path in file_paths:
+                stats: Dict[str, int] = {}
+                file_start = len(pending)
+                yielded = False
+                try:
+                    for batch in self._iter_chunk_batches(file_path, stats):
+                        pending.extend(batch)
+                        if len(pending) >= config.INGEST_BATCH_SIZE:
+                            yield pending
+                            pending, file_start, yielded = [], 0, True
+                except Exception as e:
+                    error = (
+                        f"File not found: {file_path}" if isinstance(e, FileNotFoundError)
+                        else f"Error processing document: {str(e)}"
+                    )
+                    logger.warning(f"Skipping {file_path.name}: {error}")
+                    file_results[str(file_path)] = (None, error)
+                    del pending[file_start:]  # drop this file's unsent chunks
+                    if yielded:
+                        partially_stored.append(file_path)
+                    continue
+
+                if not stats["pages"]:
+                    file_results[str(file_path)] = (None, self._NO_PAGES_ERROR)
+                elif not stats["chunks"]:
+                    file_results[str(file_path)] = (None, self._NO_CHUNKS_ERROR)
+                else:
+                    file_results[str(file_path)] = (stats["chunks"], None)
+
+            if pending:
+                yield pending
+
+        # Parsing runs on this thread while embedding and inserts run on workers
+        self._embed_and_store_pipelined(chunk_batches(), vector_store)
+
+        # A file that failed after some of its chunks were stored is removed entirely
+        for file_path in partially_stored:
+            vector_store.collection.delete(where={"source_file": file_path.name})
+
+        indexed = sum(count for count, error in file_results.values() if not error)
+        logger.info(f"Successfully indexed {indexed} chunks to collection '{collection_name}'")
+
+        return file_results, None
+
     def query(
         self,
         question: str,
@@ -167,21 +431,8 @@ class RAGService:
 
             logger.info(f"Processing query: '{question[:50]}...' (collection: {collection_name})")
 
-            # Initialize RAG pipeline
-            vector_store = VectorStore(
-                collection_name=collection_name,
-                persist_directory=str(config.VECTOR_STORE_DIR)
-            )
-
-            retriever = RAGRetriever(
-                vector_store=vector_store,
-                embedding_manager=self.embedding_manager
-            )
-
-            pipeline = RAGPipeline(
-                retriever=retriever,
-                llm=self.llm
-            )
+            # Reuse the RAG pipeline for this collection
+            pipeline = self._get_pipeline(collection_name)
 
             # Execute query - RAGPipeline has 'answer' method, not 'query'
             result = pipeline.answer(question, top_k=top_k)
@@ -209,13 +460,42 @@ class RAGService:
                 "mode": "rag"
             }
 
+    def query_stream(
+        self,
+        question: str,
+        collection_name: str = "pdf_documents",
+        top_k: int = None
+    ) -> Iterator[Dict]:
+        """
+        Query the RAG system, streaming the answer as it is generated
+
+        Args:
+            question: User query
+            collection_name: ChromaDB collection to search
+            top_k: Number of results to retrieve (default from config)
+
+        Yields:
+            RAGPipeline.answer_stream events ("sources", "token", "done"), or a
+            single {"type": "error", "error": str} if the query fails
+        """
+        if not question or not question.strip():
+            yield {"type": "error", "error": "Question cannot be empty"}
+            return
+
+        try:
+            logger.info(f"Processing streamed query: '{question[:50]}...' (collection: {collection_name})")
+            pipeline = self._get_pipeline(collection_name)
+            yield from pipeline.answer_stream(question, top_k=top_k or config.TOP_K_RESULTS)
+
+        except Exception as e:
+            error_msg = f"Error during query: {str(e)}"
+            logger.error(error_msg, exc_info=True)
+            yield {"type": "error", "error": error_msg}
+
     def get_collection_stats(self, collection_name: str) -> Optional[Dict]:
         """Get statistics for a collection"""
         try:
-            vector_store = VectorStore(
-                collection_name=collection_name,
-                persist_directory=str(config.VECTOR_STORE_DIR)
-            )
+            vector_store = self._get_vector_store(collection_name)
 
             stats = vector_store.get_collection_stats()
             return stats
@@ -227,12 +507,15 @@ class RAGService:
     def delete_collection(self, collection_name: str) -> bool:
         """Delete a collection from ChromaDB"""
         try:
-            vector_store = VectorStore(
-                collection_name=collection_name,
-                persist_directory=str(config.VECTOR_STORE_DIR)
-            )
+            vector_store = self._get_vector_store(collection_name)
 
             vector_store.clear_collection()
+
+            # Drop cached handles so the collection is reopened on next use
+            with self._cache_lock:
+                self._vector_stores.pop(collection_name, None)
+                self._pipelines.pop(collection_name, None)
+
             logger.info(f"Collection deleted: {collection_name}")
             return True
 
@@ -254,15 +537,12 @@ class RAGService:
             test_embedding = self.embedding_manager.generate_embeddings(["test"])
             health["embedding_manager"] = len(test_embedding) > 0
 
-            # Test LLM - GeminiLLM has 'generate' method, not 'generate_response'
-            test_response = self.llm.generate("test prompt")
+            # Test LLM - bypass the response cache so Gemini is actually reached
+            test_response = self.llm.generate("test prompt", use_cache=False)
             health["llm"] = test_response is not None
 
             # Test vector store
-            vector_store = VectorStore(
-                collection_name="pdf_documents",
-                persist_directory=str(config.VECTOR_STORE_DIR)
-            )
+            vector_store = self._get_vector_store("pdf_documents")
             stats = vector_store.get_collection_stats()
             health["vector_store"] = stats is not None
 
@@ -277,6 +557,39 @@ class RAGService:
 
         return health
 
+    @staticmethod
+    def _build_chat_prompt(question: str) -> str:
+        """Build the direct-chat prompt, adding today's date for time questions"""
+        # Smart date context: Only provide date for time-specific queries
+        # This prevents hallucinations when asking about recent events
+        is_time_query = bool(_TIME_QUERY_RE.search(question))
+
+        if is_time_query:
+            # Provide date context for time-specific questions
+            current_date = datetime.now().strftime("%A, %B %d, %Y")
+            prompt = f"""Current date: {current_date}
+
+{question}"""
+        else:
+            # No date context - let Gemini answer from its knowledge base
+            # This prevents hallucinations about recent events
+            prompt = question
+
+        return prompt
+
+    def chat_stream(self, question: str) -> Iterator[str]:
+        """
+        Direct LLM chat without RAG, streamed as the model generates it
+
+        Args:
+            question: User's question
+
+        Yields:
+            Answer text chunks
+        """
+        logger.info(f"Direct LLM chat (streaming): '{question[:50]}...'")
+        yield from self.llm.generate_stream(self._build_chat_prompt(question))
+
     def chat(self, question: str) -> Dict:
         """
         Direct LLM chat without RAG (normal conversational AI)
@@ -296,30 +609,7 @@ class RAGService:
         try:
             logger.info(f"Direct LLM chat: '{question[:50]}...'")
 
-            # Smart date context: Only provide date for time-specific queries
-            # This prevents hallucinations when asking about recent events
-            from datetime import datetime
-
-            question_lower = question.lower()
-            time_keywords = [
-                "today", "date", "what day", "current date", "what's the date",
-                "time", "now", "current time"
-            ]
-
-            # Check if question is asking about current date/time
-            is_time_query = any(keyword in question_lower for keyword in time_keywords)
-
-            if is_time_query:
-                # Provide date context for time-specific questions
-                current_date = datetime.now().strftime("%A, %B %d, %Y")
-                prompt = f"""Current date: {current_date}
-
-{question}"""
-            else:
-                # No date context - let Gemini answer from its knowledge base
-                # This prevents hallucinations about recent events
-                prompt = question
-
+            prompt = self._build_chat_prompt(question)
             answer = self.llm.generate(prompt)
 
             return {
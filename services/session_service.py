@@ -2,17 +2,16 @@
 Session Service - Manages user sessions and ChromaDB collections
 Handles session-based vector store isolation
 """
+import itertools
 import logging
+import threading
 import uuid
+from collections import OrderedDict
 from typing import Optional, Dict, List
 from datetime import datetime, timedelta
 
 from config import config
 
-logging.basicConfig(
-    level=getattr(logging, config.LOG_LEVEL),
-    format=config.LOG_FORMAT
-)
 logger = logging.getLogger(__name__)
 
 
@@ -20,79 +19,109 @@ class SessionService:
     """Manages session state and collection lifecycle"""
 
     def __init__(self):
-        self.sessions: Dict[str, dict] = {}
+        # Ordered by last activity (oldest first) so expiry can stop early
+        self.sessions: "OrderedDict[str, dict]" = OrderedDict()
         self.timeout_minutes = config.SESSION_TIMEOUT_MINUTES
+        self._timeout = timedelta(minutes=self.timeout_minutes)
+        self._file_counters: Dict[str, itertools.count] = {}
+
+        # Guards sessions/_file_counters; reentrant because methods call each other
+        self._lock = threading.RLock()
 
     def create_session(self) -> str:
         """Create new session and return session ID"""
         session_id = str(uuid.uuid4())
         collection_name = f"session_{session_id.replace('-', '_')}"
 
-        self.sessions[session_id] = {
-            "session_id": session_id,
-            "collection_name": collection_name,
-            "created_at": datetime.now(),
-            "last_activity": datetime.now(),
-            "document_count": 0,
-            "query_count": 0,
-            "uploaded_files": [],
-        }
+        with self._lock:
+            self.sessions[session_id] = {
+                "session_id": session_id,
+                "collection_name": collection_name,
+                "created_at": datetime.now(),
+                "last_activity": datetime.now(),
+                "document_count": 0,
+                "query_count": 0,
+                "uploaded_files": [],
+            }
 
         logger.info(f"Session created: {session_id}")
         return session_id
 
+    def _touch(self, session_id: str):
+        """Record activity and move the session to the most-recent end (caller holds _lock)"""
+        self.sessions[session_id]["last_activity"] = datetime.now()
+        self.sessions.move_to_end(session_id)
+
     def get_session(self, session_id: str) -> Optional[dict]:
         """Get session data"""
-        if session_id not in self.sessions:
-            return None
+        with self._lock:
+            if session_id not in self.sessions:
+                return None
 
-        # Update last activity
-        self.sessions[session_id]["last_activity"] = datetime.now()
-        return self.sessions[session_id]
+            # Update last activity
+            self._touch(session_id)
+            return self.sessions[session_id]
 
     def update_session(self, session_id: str, **kwargs):
         """Update session metadata"""
-        if session_id in self.sessions:
-            self.sessions[session_id].update(kwargs)
-            self.sessions[session_id]["last_activity"] = datetime.now()
+        with self._lock:
+            if session_id in self.sessions:
+                self.sessions[session_id].update(kwargs)
+                self._touch(session_id)
 
     def add_file_to_session(self, session_id: str, filename: str, doc_count: int):
         """Record uploaded file in session"""
-        if session_id in self.sessions:
+        with self._lock:
+            if session_id not in self.sessions:
+                return
             self.sessions[session_id]["uploaded_files"].append({
                 "filename": filename,
                 "uploaded_at": datetime.now().isoformat(),
                 "document_count": doc_count,
             })
             self.sessions[session_id]["document_count"] += doc_count
-            logger.info(f"File added to session {session_id}: {filename} ({doc_count} chunks)")
+        logger.info(f"File added to session {session_id}: {filename} ({doc_count} chunks)")
+
+    def next_file_index(self, session_id: str) -> int:
+        """Next upload index for a session (unique and increasing per session)"""
+        with self._lock:
+            counter = self._file_counters.setdefault(session_id, itertools.count(1))
+            return next(counter)
 
     def increment_query_count(self, session_id: str):
         """Track query usage"""
-        if session_id in self.sessions:
-            self.sessions[session_id]["query_count"] += 1
-            self.sessions[session_id]["last_activity"] = datetime.now()
+        with self._lock:
+            if session_id in self.sessions:
+                self.sessions[session_id]["query_count"] += 1
+                self._touch(session_id)
 
     def is_session_expired(self, session_id: str) -> bool:
         """Check if session has expired"""
-        if session_id not in self.sessions:
-            return True
-
-        last_activity = self.sessions[session_id]["last_activity"]
-        timeout = timedelta(minutes=self.timeout_minutes)
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                return True
+            last_activity = session["last_activity"]
 
-        return datetime.now() - last_activity > timeout
+        return datetime.now() - last_activity > self._timeout
 
     def cleanup_expired_sessions(self) -> List[str]:
         """Remove expired sessions"""
-        expired = [
-            sid for sid in self.sessions
-            if self.is_session_expired(sid)
-        ]
+        # Sessions are ordered oldest-activity first, so stop at the first live one
+        expired = []
+        now = datetime.now()
+        with self._lock:
+            while self.sessions:
+                sid, session = next(iter(self.sessions.items()))
+                if now - session["last_activity"] <= self._timeout:
+                    break
+
+                del self.sessions[sid]
+                self._file_counters.pop(sid, None)
+                expired.append(sid)
 
         for sid in expired:
             logger.info(f"Removing expired session: {sid}")
-            del self.sessions[sid]
 
         return expired
 
@@ -103,24 +132,28 @@ class SessionService:
 
     def get_session_stats(self, session_id: str) -> Optional[dict]:
         """Get session statistics"""
-        session = self.get_session(session_id)
-        if not session:
-            return None
-
-        return {
-            "session_id": session_id,
-            "created_at": session["created_at"].isoformat(),
-            "last_activity": session["last_activity"].isoformat(),
-            "document_count": session["document_count"],
-            "query_count": session["query_count"],
-            "files_uploaded": len(session["uploaded_files"]),
-            "active": not self.is_session_expired(session_id),
-        }
+        with self._lock:
+            session = self.get_session(session_id)
+            if not session:
+                return None
+
+            return {
+                "session_id": session_id,
+                "created_at": session["created_at"].isoformat(),
+                "last_activity": session["last_activity"].isoformat(),
+                "document_count": session["document_count"],
+                "query_count": session["query_count"],
+                "files_uploaded": len(session["uploaded_files"]),
+                "active": not self.is_session_expired(session_id),
+            }
 
     def delete_session(self, session_id: str) -> bool:
         """Manually delete a session"""
-        if session_id in self.sessions:
-            logger.info(f"Session deleted: {session_id}")
+        with self._lock:
+            if session_id not in self.sessions:
+                return False
             del self.sessions[session_id]
-            return True
-        return False
+            self._file_counters.pop(session_id, None)
+
+        logger.info(f"Session deleted: {session_id}")
+        return True
@@ -8,20 +8,41 @@ A modular Retrieval-Augmented Generation (RAG) pipeline using:
 - Google Gemini for answer generation
 """
 
-from .data_loader import PDFDocumentLoader
-from .embedding import EmbeddingManager
-from .vectorstore import VectorStore
-from .search import RAGRetriever
-from .llm import GeminiLLM
-from .rag_pipeline import RAGPipeline
+import importlib
 
 __version__ = "1.0.0"
 
+# Public names are imported lazily (PEP 562) so that importing one component
+# does not pull in torch, chromadb, LangChain and the Gemini SDK all at once
+_LAZY_IMPORTS = {
+    "PDFDocumentLoader": ".data_loader",
+    "EmbeddingManager": ".embedding",
+    "EmbeddingBatcher": ".embedding",
+    "VectorStore": ".vectorstore",
+    "RAGRetriever": ".search",
+    "GeminiLLM": ".llm",
+    "RAGPipeline": ".rag_pipeline",
+}
+
 __all__ = [
     "PDFDocumentLoader",
     "EmbeddingManager",
+    "EmbeddingBatcher",
     "VectorStore",
     "RAGRetriever",
     "GeminiLLM",
     "RAGPipeline",
 ]
+
+
+def __getattr__(name):
+    module_name = _LAZY_IMPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_IMPORTS))
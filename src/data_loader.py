@@ -4,12 +4,177 @@ PDF Document Loader Module
 This module handles loading and processing PDF documents for the RAG pipeline.
 """
 
+import logging
 import os
 from pathlib import Path
 from typing import List, Any
 from langchain_community.document_loaders import PyPDFLoader
+from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+logger = logging.getLogger(__name__)
+
+
+class RustTextSplitter:
+    """
+    Adapter exposing split_documents() over the Rust `semantic-text-splitter`
+
+    Splits on semantic levels (paragraphs, sentences, words, characters)
+    rather than an explicit separator list.
+    """
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+        """
+        Args:
+            chunk_size: Maximum number of characters per chunk
+            chunk_overlap: Number of characters to overlap between chunks
+        """
+        from semantic_text_splitter import TextSplitter
+
+        self._splitter = TextSplitter(chunk_size, overlap=chunk_overlap)
+
+    def split_documents(self, documents: List[Any]) -> List[Any]:
+        """Split documents into chunks, copying each source document's metadata"""
+        return [
+            Document(page_content=chunk, metadata=dict(doc.metadata))
+            for doc in documents
+            for chunk in self._splitter.chunks(doc.page_content)
+        ]
+
+
+def create_text_splitter(
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+    separators: List[str] = None
+):
+    """
+    Create the fastest available text splitter
+
+    Uses the Rust `semantic-text-splitter` when installed and falls back to
+    LangChain's RecursiveCharacterTextSplitter otherwise.
+
+    Args:
+        chunk_size: Maximum size of each text chunk
+        chunk_overlap: Number of characters to overlap between chunks
+        separators: Separators for the LangChain fallback
+
+    Returns:
+        Splitter with a split_documents(documents) method
+    """
+    try:
+        return RustTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    except ImportError:
+        return RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=len,
+            separators=separators or ["\n\n", "\n", " ", ""]
+        )
+
+
+def _overlap_length(previous: str, following: str, max_overlap: int) -> int:
+    """
+    Length of the longest suffix of `previous` that is a prefix of `following`
+
+    Matches shorter than 10 characters are ignored so that a coincidental
+    shared letter or space is never mistaken for splitter overlap.
+
+    Args:
+        previous: Text of the earlier chunk
+        following: Text of the later chunk
+        max_overlap: Longest overlap to look for (the splitter's chunk_overlap)
+
+    Returns:
+        Number of characters to drop from the start of `following`
+    """
+    longest = min(max_overlap, len(previous), len(following))
+    for size in range(longest, 9, -1):
+        if previous.endswith(following[:size]):
+            return size
+    return 0
+
+
+def _merge_metadata(first: dict, second: dict) -> dict:
+    """
+    Union of two chunks' metadata
+
+    Keys from both chunks are kept; on conflicts the first chunk's value wins.
+    When the chunks come from different pages the last page is recorded under
+    'page_end' so the merged chunk's page range stays known.
+
+    Args:
+        first: Metadata of the earlier chunk
+        second: Metadata of the later chunk
+
+    Returns:
+        Merged metadata dict
+    """
+    metadata = {**second, **first}
+    last_page = second.get('page_end', second.get('page'))
+    if 'page' in first and last_page is not None and last_page != first['page']:
+        metadata['page_end'] = last_page
+    return metadata
+
+
+def refine_chunks(
+    chunks: List[Any],
+    text_splitter,
+    min_chars: int = 400,
+    max_chars: int = 1150,
+    chunk_overlap: int = 200
+) -> List[Any]:
+    """
+    Second pass over split chunks: re-split oversized ones, merge tiny neighbours
+
+    Adjacent chunks from the same source are merged when one of them is
+    shorter than `min_chars` and the result stays within `max_chars`. The
+    text the splitter repeated between the two chunks is kept only once, and
+    the merged chunk carries the union of both chunks' metadata.
+
+    Args:
+        chunks: Chunked Document objects in document order
+        text_splitter: Splitter used to break up chunks longer than max_chars
+        min_chars: Chunks shorter than this are merged into a neighbour
+        max_chars: Upper bound on chunk length after both passes
+        chunk_overlap: Overlap the splitter used; bounds the overlap search
+
+    Returns:
+        List of refined Document objects
+    """
+    sized = []
+    for chunk in chunks:
+        if len(chunk.page_content) > max_chars:
+            sized.extend(text_splitter.split_documents([chunk]))
+        else:
+            sized.append(chunk)
+
+    merged = []
+    for chunk in sized:
+        if merged:
+            previous = merged[-1]
+            prev_len = len(previous.page_content)
+            chunk_len = len(chunk.page_content)
+            if (
+                (prev_len < min_chars or chunk_len < min_chars)
+                and previous.metadata.get('source') == chunk.metadata.get('source')
+            ):
+                overlap = _overlap_length(
+                    previous.page_content, chunk.page_content, chunk_overlap
+                )
+                if overlap:
+                    text = previous.page_content + chunk.page_content[overlap:]
+                else:
+                    text = previous.page_content + "\n" + chunk.page_content
+                if len(text) <= max_chars:
+                    merged[-1] = Document(
+                        page_content=text,
+                        metadata=_merge_metadata(previous.metadata, chunk.metadata)
+                    )
+                    continue
+        merged.append(chunk)
+
+    return merged
+
 
 class PDFDocumentLoader:
     """Handles loading and chunking PDF documents"""
@@ -33,10 +198,9 @@ class PDFDocumentLoader:
         self.separators = separators or ["\n\n", "\n", " ", ""]
 
         # Initialize text splitter
-        self.text_splitter = RecursiveCharacterTextSplitter(
+        self.text_splitter = create_text_splitter(
             chunk_size=self.chunk_size,
             chunk_overlap=self.chunk_overlap,
-            length_function=len,
             separators=self.separators
         )
 
@@ -56,26 +220,26 @@ class PDFDocumentLoader:
         # Find all PDF files recursively
         pdf_files = list(pdf_dir.glob("**/*.pdf"))
 
-        print(f"Found {len(pdf_files)} PDF files to process")
+        logger.info(f"Found {len(pdf_files)} PDF files to process")
 
         for pdf_file in pdf_files:
-            print(f"\nProcessing: {pdf_file.name}")
+            logger.debug(f"Processing: {pdf_file.name}")
             try:
                 loader = PyPDFLoader(str(pdf_file))
                 documents = loader.load()
 
                 # Add source information to metadata
+                source_metadata = {'source_file': pdf_file.name, 'file_type': 'pdf'}
                 for doc in documents:
-                    doc.metadata['source_file'] = pdf_file.name
-                    doc.metadata['file_type'] = 'pdf'
+                    doc.metadata.update(source_metadata)
 
                 all_documents.extend(documents)
-                print(f"  ✓ Loaded {len(documents)} pages")
+                logger.debug(f"Loaded {len(documents)} pages from {pdf_file.name}")
 
             except Exception as e:
-                print(f"  ✗ Error: {e}")
+                logger.warning(f"Error loading {pdf_file.name}: {e}")
 
-        print(f"\nTotal documents loaded: {len(all_documents)}")
+        logger.info(f"Total documents loaded: {len(all_documents)}")
         return all_documents
 
     def split_documents(self, documents: List[Any]) -> List[Any]:
@@ -89,12 +253,11 @@ class PDFDocumentLoader:
             List of chunked Document objects
         """
         split_docs = self.text_splitter.split_documents(documents)
-        print(f"Split {len(documents)} documents into {len(split_docs)} chunks")
+        logger.info(f"Split {len(documents)} documents into {len(split_docs)} chunks")
 
-        if split_docs:
-            print(f"\nExample chunk:")
-            print(f"Content: {split_docs[0].page_content[:200]}...")
-            print(f"Metadata: {split_docs[0].metadata}")
+        if split_docs and logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Example chunk content: {split_docs[0].page_content[:200]}...")
+            logger.debug(f"Example chunk metadata: {split_docs[0].metadata}")
 
         return split_docs
 
@@ -4,52 +4,276 @@ Embedding Generation Module
 This module handles generating embeddings for text using SentenceTransformers.
 """
 
-from typing import List
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple
 import numpy as np
-from sentence_transformers import SentenceTransformer
+
+logger = logging.getLogger(__name__)
+
+
+class ONNXEmbeddingBackend:
+    """
+    Runs a sentence-transformers model through ONNX Runtime
+
+    The model is exported to ONNX, graph-optimized and dynamically quantized
+    to INT8 once, then cached on disk. Exposes the subset of the
+    SentenceTransformer API used by EmbeddingManager.
+
+    Requires the optional `optimum[onnxruntime]` dependency.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "all-MiniLM-L6-v2",
+        cache_dir: str = "../data/onnx_models",
+        max_length: int = 256
+    ):
+        """
+        Initialize the ONNX backend
+
+        Args:
+            model_name: HuggingFace model name for sentence embeddings
+            cache_dir: Directory for exported/quantized ONNX models
+            max_length: Maximum tokens per input text
+        """
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.max_length = max_length
+        model_dir = self._export(model_name, Path(cache_dir))
+
+        self.tokenizer = AutoTokenizer.from_pretrained(str(model_dir), use_fast=True)
+
+        session_options = ort.SessionOptions()
+        session_options.intra_op_num_threads = os.cpu_count() or 1
+        providers = [
+            provider for provider in ("CUDAExecutionProvider", "CPUExecutionProvider")
+            if provider in ort.get_available_providers()
+        ]
+        self.session = ort.InferenceSession(
+            str(model_dir / "model_optimized_quantized.onnx"),
+            sess_options=session_options,
+            providers=providers
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+        self._dimension = self.session.get_outputs()[0].shape[-1]
+
+    @staticmethod
+    def _export(model_name: str, cache_dir: Path) -> Path:
+        """Export, optimize and quantize the model unless already cached"""
+        hf_name = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+        model_dir = cache_dir / hf_name.replace("/", "__")
+        if (model_dir / "model_optimized_quantized.onnx").exists():
+            return model_dir
+
+        from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTOptimizer, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig, OptimizationConfig
+        from transformers import AutoTokenizer
+
+        model = ORTModelForFeatureExtraction.from_pretrained(hf_name, export=True)
+        model.save_pretrained(model_dir)
+        AutoTokenizer.from_pretrained(hf_name).save_pretrained(model_dir)
+
+        optimizer = ORTOptimizer.from_pretrained(model)
+        optimizer.optimize(
+            save_dir=model_dir,
+            optimization_config=OptimizationConfig(optimization_level=99)
+        )
+
+        quantizer = ORTQuantizer.from_pretrained(model_dir, file_name="model_optimized.onnx")
+        quantizer.quantize(
+            save_dir=model_dir,
+            quantization_config=AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+        )
+        return model_dir
+
+    def encode(
+        self,
+        texts: List[str],
+        batch_size: int = 32,
+        show_progress_bar: bool = False,
+        **kwargs
+    ) -> np.ndarray:
+        """
+        Encode texts into mean-pooled, L2-normalized embeddings
+
+        Texts are tokenized once by the fast (Rust) tokenizer, sorted by
+        token length and batched so each batch pads only to its own longest
+        sequence. Results are scattered back to input order.
+
+        Args:
+            texts: List of text strings to embed
+            batch_size: Number of texts per session run
+            show_progress_bar: Accepted for API compatibility, ignored
+
+        Returns:
+            numpy array of embeddings with shape (len(texts), embedding_dim)
+        """
+        embeddings = np.empty((len(texts), self._dimension), dtype=np.float32)
+        if not texts:
+            return embeddings
+
+        encoded = self.tokenizer(list(texts), truncation=True, max_length=self.max_length)
+        order = np.argsort([len(ids) for ids in encoded["input_ids"]], kind="stable")
+
+        for start in range(0, len(texts), batch_size):
+            batch_idx = order[start:start + batch_size]
+            tokens = self.tokenizer.pad(
+                {name: [encoded[name][i] for i in batch_idx] for name in encoded.keys()},
+                padding="longest",
+                return_tensors="np"
+            )
+            feed = {name: value for name, value in tokens.items() if name in self._input_names}
+            hidden = self.session.run(None, feed)[0]
+
+            # Mean-pool over non-padding tokens
+            mask = tokens["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            embeddings[batch_idx] = pooled
+
+        return embeddings
+
+    def get_sentence_embedding_dimension(self) -> int:
+        """Get the dimension of embeddings produced by this model"""
+        return self._dimension
 
 
 class EmbeddingManager:
-    """Handles document embedding generation using SentenceTransformer"""
+    """
+    Handles document embedding generation using SentenceTransformer
 
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+    Embeddings are always L2-normalized (unit length), so inner product
+    equals cosine similarity; VectorStore relies on this for its "ip" space.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "all-MiniLM-L6-v2",
+        backend: str = "torch",
+        onnx_cache_dir: str = "../data/onnx_models",
+        background_load: bool = False,
+        batch_size: Optional[int] = None,
+        max_seq_length: Optional[int] = None,
+        compile_model: bool = False,
+        cache_dir: Optional[str] = None
+    ):
         """
         Initialize the embedding manager
 
         Args:
             model_name: HuggingFace model name for sentence embeddings
+            backend: "torch" for SentenceTransformer or "onnx" for ONNX Runtime INT8
+            onnx_cache_dir: Directory for exported ONNX models (onnx backend only)
+            background_load: Load the model in a background thread; the first
+                access to `model` waits for it to finish
+            batch_size: Texts per forward pass (default: 128 on GPU, 32 on CPU)
+            max_seq_length: Token limit per text (default: the model's own limit)
+            compile_model: On CUDA, compile the transformer with torch.compile
+                (slower first batches while kernels are built)
+            cache_dir: Directory for a persistent on-disk embedding cache
+                (None disables it)
         """
         self.model_name = model_name
-        self.model = None
-        self._load_model()
+        self.backend = backend
+        self.onnx_cache_dir = onnx_cache_dir
+        self.batch_size = batch_size
+        self.max_seq_length = max_seq_length
+        self.compile_model = compile_model
+        self.device = None
+        self.embedding_dim = None
+        self._model = None
+        self._model_future: Optional[Future] = None
+
+        self.cache = None
+        if cache_dir:
+            from .embedding_cache import DiskEmbeddingCache
+            namespace = f"{model_name}-{backend}-{max_seq_length or 'default'}"
+            self.cache = DiskEmbeddingCache(cache_dir, namespace=namespace)
+
+        if background_load:
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-loader")
+            self._model_future = executor.submit(self._load_model)
+            executor.shutdown(wait=False)
+        else:
+            self._load_model()
+
+    @property
+    def model(self):
+        """The loaded model, waiting for a background load if one is in flight"""
+        if self._model is None and self._model_future is not None:
+            self._model_future.result()
+        return self._model
+
+    @model.setter
+    def model(self, value):
+        self._model = value
 
     def _load_model(self):
-        """Load the SentenceTransformer model"""
-        import logging
-        import torch
-        logger = logging.getLogger(__name__)
+        """Load the SentenceTransformer model (or the ONNX backend)"""
         try:
+            if self.backend == "onnx":
+                logger.info(f"Loading ONNX embedding model: {self.model_name}")
+                self.device = "cpu"
+                self.batch_size = self.batch_size or 32
+                model = ONNXEmbeddingBackend(
+                    self.model_name,
+                    cache_dir=self.onnx_cache_dir,
+                    max_length=self.max_seq_length or 256
+                )
+                # Publish the model last: a background load is "ready" once
+                # self.model is set, so derived fields must already be in place
+                self.embedding_dim = model.get_sentence_embedding_dimension()
+                self.model = model
+                logger.info(f"Model loaded successfully. Embedding dimension: {self.embedding_dim}")
+                return
+
+            # Imported only on the torch path so the ONNX backend never loads torch
+            import torch
+            from sentence_transformers import SentenceTransformer
+
             # Check GPU availability
             device = "cuda" if torch.cuda.is_available() else "cpu"
             logger.info(f"Loading embedding model: {self.model_name}")
             logger.info(f"Using device: {device}")
-            print(f"Loading embedding model: {self.model_name}")
-            print(f"Using device: {device}")
 
             if device == "cuda":
                 gpu_name = torch.cuda.get_device_name(0)
                 gpu_memory = torch.cuda.get_device_properties(0).total_memory / 1024**3
                 logger.info(f"GPU: {gpu_name} ({gpu_memory:.1f} GB)")
-                print(f"GPU: {gpu_name} ({gpu_memory:.1f} GB)")
 
             # Load model to specified device
-            self.model = SentenceTransformer(self.model_name, device=device)
-            embedding_dim = self.model.get_sentence_embedding_dimension()
-            logger.info(f"Model loaded successfully. Embedding dimension: {embedding_dim}")
-            print(f"Model loaded successfully. Embedding dimension: {embedding_dim}")
+            model = SentenceTransformer(self.model_name, device=device)
+            if self.max_seq_length:
+                model.max_seq_length = self.max_seq_length
+            if device == "cuda":
+                # FP16 halves memory traffic and roughly doubles GPU throughput
+                model.half()
+
+                if self.compile_model:
+                    # Compile the inner transformer: encode() calls it directly,
+                    # and sequence lengths vary between batches
+                    model[0].auto_model = torch.compile(
+                        model[0].auto_model,
+                        mode="reduce-overhead",
+                        dynamic=True
+                    )
+                    logger.info("Embedding transformer compiled with torch.compile")
+
+            self.device = device
+            self.batch_size = self.batch_size or (128 if device == "cuda" else 32)
+            self.embedding_dim = model.get_sentence_embedding_dimension()
+            self.model = model
+            logger.info(f"Model loaded successfully. Embedding dimension: {self.embedding_dim}")
         except Exception as e:
             logger.error(f"Error loading model {self.model_name}: {e}")
-            print(f"Error loading model {self.model_name}: {e}")
             raise
 
     def generate_embeddings(self, texts: List[str], show_progress: bool = True) -> np.ndarray:
@@ -61,16 +285,74 @@ class EmbeddingManager:
             show_progress: Whether to show progress bar
 
         Returns:
-            numpy array of embeddings with shape (len(texts), embedding_dim)
+            Contiguous float32 numpy array with shape (len(texts), embedding_dim)
         """
+        if self.cache is None or not texts:
+            return self._encode(texts, show_progress)
+
+        # Only cache misses go through the model; hits are scattered back in order
+        cached = self.cache.get_many(texts)
+        miss_idx = [i for i, vector in enumerate(cached) if vector is None]
+        if not miss_idx:
+            return np.ascontiguousarray(np.stack(cached), dtype=np.float32)
+
+        miss_texts = [texts[i] for i in miss_idx]
+        miss_embeddings = self._encode(miss_texts, show_progress)
+        self.cache.put_many(miss_texts, miss_embeddings)
+        if len(miss_idx) == len(texts):
+            return miss_embeddings
+
+        embeddings = np.empty((len(texts), miss_embeddings.shape[1]), dtype=np.float32)
+        for i, vector in enumerate(cached):
+            if vector is not None:
+                embeddings[i] = vector
+        embeddings[miss_idx] = miss_embeddings
+        logger.debug(f"Embedding cache: {len(texts) - len(miss_idx)} hits, {len(miss_idx)} misses")
+        return embeddings
+
+    def _encode(self, texts: List[str], show_progress: bool) -> np.ndarray:
+        """Run the model over texts (no caching)"""
         if not self.model:
             raise ValueError("Model not loaded")
 
-        print(f"Generating embeddings for {len(texts)} texts...")
-        embeddings = self.model.encode(texts, show_progress_bar=show_progress)
-        print(f"Generated embeddings with shape: {embeddings.shape}")
+        logger.debug(f"Generating embeddings for {len(texts)} texts...")
+        # No pre-sorting here: both backends already bucket texts by length
+        # before batching (SentenceTransformer.encode sorts by length
+        # internally, ONNXEmbeddingBackend.encode by token count) and
+        # return embeddings in input order.
+        embeddings = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            show_progress_bar=show_progress,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            device=self.device
+        )
+        # FP16 models return float16; downstream expects contiguous float32
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        logger.debug(f"Generated embeddings with shape: {embeddings.shape}")
         return embeddings
 
+    @staticmethod
+    def quantize_int8(embeddings: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Quantize embeddings to int8 with one scale per row
+
+        Each row is divided by max(|x|) / 127 and rounded, so
+        codes[i] * scales[i] approximates embeddings[i].
+
+        Args:
+            embeddings: Float array with shape (n, embedding_dim)
+
+        Returns:
+            (codes int8 (n, embedding_dim), scales float32 (n,))
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        scales = np.abs(embeddings).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.rint(embeddings / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
     def get_embedding_dimension(self) -> int:
         """
         Get the dimension of embeddings produced by this model
@@ -80,4 +362,65 @@ class EmbeddingManager:
         """
         if not self.model:
             raise ValueError("Model not loaded")
-        return self.model.get_sentence_embedding_dimension()
+        return self.embedding_dim
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent single-text embedding requests into batched forward passes
+
+    Callers get a Future from embed_one(); a background thread flushes the
+    pending texts through EmbeddingManager.generate_embeddings once
+    max_batch_size requests are queued or max_wait seconds have passed.
+    """
+
+    def __init__(self, embedding_manager: EmbeddingManager, max_batch_size: int = 32, max_wait: float = 0.01):
+        """
+        Args:
+            embedding_manager: EmbeddingManager used for the batched calls
+            max_batch_size: Maximum number of texts per forward pass
+            max_wait: Seconds to wait for more requests after the first arrives
+        """
+        self.embedding_manager = embedding_manager
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue: queue.Queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    def embed_one(self, text: str) -> Future:
+        """
+        Queue a text for embedding
+
+        Returns:
+            Future resolving to the text's embedding (shape (embedding_dim,))
+        """
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def _run(self):
+        while True:
+            pending = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(pending) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    pending.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                embeddings = self.embedding_manager.generate_embeddings(
+                    [text for text, _ in pending],
+                    show_progress=False
+                )
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), embedding in zip(pending, embeddings):
+                future.set_result(embedding)
@@ -0,0 +1,96 @@
+"""
+Embedding Cache Module
+
+This module persists text embeddings on disk so identical texts are not
+re-embedded, including across process restarts.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class DiskEmbeddingCache:
+    """
+    Flat directory of .npy vectors keyed by sha256(text)
+
+    Files are sharded into 256 subdirectories by the first two hex digits of
+    the key. Entries are written atomically (temp file + rename), so
+    concurrent writers and crashes never leave a truncated vector behind.
+    """
+
+    def __init__(self, directory: str, namespace: str = "default"):
+        """
+        Initialize the cache
+
+        Args:
+            directory: Root directory for cached embeddings
+            namespace: Subdirectory name; use one per model/configuration so
+                vectors from different models never mix
+        """
+        safe_namespace = re.sub(r"[^A-Za-z0-9._-]", "_", namespace)
+        self.directory = Path(directory) / safe_namespace
+        self.directory.mkdir(parents=True, exist_ok=True)
+        logger.info(f"Embedding disk cache at {self.directory}")
+
+    @staticmethod
+    def key(text: str) -> str:
+        """Cache key for a text"""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.npy"
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Look up cached embeddings
+
+        Args:
+            texts: Texts to look up
+
+        Returns:
+            One float32 vector per text, or None where the text is not cached
+        """
+        vectors = []
+        for text in texts:
+            path = self._path(self.key(text))
+            try:
+                vectors.append(np.load(path))
+            except (FileNotFoundError, ValueError, OSError):
+                # Missing or unreadable entries are treated as misses
+                vectors.append(None)
+        return vectors
+
+    def put_many(self, texts: List[str], embeddings: np.ndarray):
+        """
+        Store embeddings for texts
+
+        Args:
+            texts: Texts that were embedded
+            embeddings: Array with shape (len(texts), embedding_dim)
+        """
+        for text, vector in zip(texts, embeddings):
+            path = self._path(self.key(text))
+            if path.exists():
+                continue
+
+            path.parent.mkdir(exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    np.save(f, np.asarray(vector, dtype=np.float32))
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning(f"Could not cache embedding {path.name}: {e}")
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
@@ -4,10 +4,21 @@ LLM Module
 This module provides a wrapper for Google Gemini API optimized for RAG applications.
 """
 
+import asyncio
+import itertools
+import logging
 import os
+import random
+import threading
 import time
-from dotenv import load_dotenv
-import google.generativeai as genai
+from collections import OrderedDict
+from typing import Iterator, List
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseBlockedError(ValueError):
+    """The model deterministically refused or truncated the answer; retrying will not help"""
 
 
 class GeminiLLM:
@@ -20,7 +31,12 @@ class GeminiLLM:
         max_output_tokens: int = 500,
         top_p: float = 0.95,
         top_k: int = 40,
-        api_key: str = None
+        api_key: str = None,
+        cache_size: int = 128,
+        max_concurrency: int = None,
+        max_retries: int = 3,
+        retry_base_delay: float = 1.0,
+        retry_max_delay: float = 32.0
     ):
         """
         Initialize the Gemini LLM
@@ -32,11 +48,25 @@ class GeminiLLM:
             top_p: Nucleus sampling parameter
             top_k: Top-k sampling parameter
             api_key: Google AI API key (if None, loads from environment)
+            cache_size: Number of prompt -> response pairs kept for identical
+                prompts (0 disables the cache)
+            max_concurrency: Maximum in-flight async requests (if None, loads
+                GEMINI_MAX_CONCURRENCY from environment, default 10)
+            max_retries: Default attempts per request for retriable errors (>= 1)
+            retry_base_delay: Backoff before the first retry, in seconds;
+                doubles per attempt, plus up to 1s of random jitter
+            retry_max_delay: Upper bound on the exponential part of the backoff
         """
+        # Imported here: the Gemini SDK (protobuf/grpc) is slow to import
+        import google.generativeai as genai
+        from google.api_core import exceptions as google_exceptions
+        self._genai = genai
+
         self.model_name = model_name
 
         # Load API key from environment if not provided
         if api_key is None:
+            from dotenv import load_dotenv
             load_dotenv()
             api_key = os.getenv("GEMINI_API_KEY")
             if not api_key:
@@ -44,8 +74,35 @@ class GeminiLLM:
                     "GEMINI_API_KEY not found. Please set it in .env file or pass as argument"
                 )
 
-        # Configure Gemini API
-        genai.configure(api_key=api_key)
+        # Configure Gemini API (gRPC keeps one long-lived channel for all calls)
+        genai.configure(api_key=api_key, transport="grpc")
+
+        # LRU cache of responses for repeated identical prompts
+        self.cache_size = cache_size
+        self._response_cache: OrderedDict = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+        # Caps overlapping agenerate() calls; the semaphore is bound per event loop
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv("GEMINI_MAX_CONCURRENCY", "10"))
+        self.max_concurrency = max(1, max_concurrency)
+        self._sem = None
+        self._sem_loop = None
+
+        # Retry policy: rate limits, server errors and timeouts are retried
+        # with jittered backoff; other API errors (4xx) and blocked responses are not
+        if max_retries < 1:
+            raise ValueError(f"max_retries must be at least 1, got {max_retries}")
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self._retriable_errors = (
+            google_exceptions.ResourceExhausted,      # 429
+            google_exceptions.InternalServerError,    # 500
+            google_exceptions.ServiceUnavailable,     # 503
+            google_exceptions.DeadlineExceeded,       # 504
+        )
+        self._api_error = google_exceptions.GoogleAPICallError
 
         # Generation config optimized for factual Q&A
         self.generation_config = {
@@ -64,12 +121,8 @@ class GeminiLLM:
         ]
 
         # Initialize model
-        import logging
-        logger = logging.getLogger(__name__)
-
         try:
             logger.info(f"Creating GenerativeModel with {self.model_name}...")
-            print(f"🔄 Creating GenerativeModel with {self.model_name}...")
 
             self.model = genai.GenerativeModel(
                 model_name=self.model_name,
@@ -79,79 +132,309 @@ class GeminiLLM:
 
             logger.info(f"GeminiLLM initialized with {self.model_name}")
             logger.info(f"Temperature: {temperature}, Max tokens: {max_output_tokens}")
-            print(f"✅ GeminiLLM initialized with {self.model_name}")
-            print(f"   Temperature: {temperature}, Max tokens: {max_output_tokens}")
 
         except Exception as e:
             logger.error(f"Failed to create GenerativeModel: {e}")
-            print(f"❌ Failed to create GenerativeModel: {e}")
             raise
 
-    def generate(self, prompt: str, max_retries: int = 3) -> str:
+    def generate(self, prompt: str, max_retries: int = None, use_cache: bool = True) -> str:
         """
         Generate response with retry logic
 
+        Identical prompts are answered from an in-process LRU cache.
+
         Args:
             prompt: The input prompt
-            max_retries: Number of retry attempts on failure
+            max_retries: Number of attempts for retriable errors (default: self.max_retries)
+            use_cache: Read and fill the response cache; pass False to always
+                call the API (e.g. health checks)
 
         Returns:
             Generated text response
         """
+        if use_cache:
+            cached = self._cache_get(prompt)
+            if cached is not None:
+                return cached
+
+        response_text = self._generate_with_retries(prompt, self._resolve_retries(max_retries))
+        if use_cache:
+            self._cache_put(prompt, response_text)
+        return response_text
+
+    async def agenerate(self, prompt: str, max_retries: int = None) -> str:
+        """
+        Generate response without blocking the event loop
+
+        Shares the response cache with generate(); at most max_concurrency
+        requests are in flight at once.
+
+        Args:
+            prompt: The input prompt
+            max_retries: Number of attempts for retriable errors (default: self.max_retries)
+
+        Returns:
+            Generated text response
+        """
+        cached = self._cache_get(prompt)
+        if cached is not None:
+            return cached
+
+        max_retries = self._resolve_retries(max_retries)
+        async with self._get_semaphore():
+            for attempt in range(max_retries):
+                try:
+                    response = await self.model.generate_content_async(prompt)
+                    response_text = self._extract_text(response)
+                    break
+                except Exception as e:
+                    wait_time = self._retry_wait(e, attempt, max_retries)
+                    if wait_time is None:
+                        raise
+                    await asyncio.sleep(wait_time)
+
+        self._cache_put(prompt, response_text)
+        return response_text
+
+    def generate_batch(self, prompts: List[str], max_retries: int = None) -> List[str]:
+        """
+        Generate responses for several prompts concurrently
+
+        Must be called from synchronous code (it runs its own event loop).
+
+        Args:
+            prompts: Input prompts
+            max_retries: Number of attempts per prompt (default: self.max_retries)
+
+        Returns:
+            Generated text responses, in the same order as prompts
+        """
+        if not prompts:
+            return []
+
+        async def _gather():
+            return await asyncio.gather(*(self.agenerate(p, max_retries) for p in prompts))
+
+        return list(asyncio.run(_gather()))
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """Semaphore for the running event loop (asyncio.run creates a new loop per batch)"""
+        loop = asyncio.get_running_loop()
+        if self._sem is None or self._sem_loop is not loop:
+            self._sem = asyncio.Semaphore(self.max_concurrency)
+            self._sem_loop = loop
+        return self._sem
+
+    def _cache_get(self, prompt: str):
+        """Cached response for an identical prompt, or None"""
+        if not self.cache_size:
+            return None
+        with self._cache_lock:
+            cached = self._response_cache.get(prompt)
+            if cached is not None:
+                self._response_cache.move_to_end(prompt)
+            return cached
+
+    def _cache_put(self, prompt: str, response_text: str):
+        """Store a response, evicting the least recently used entry when full"""
+        if not self.cache_size:
+            return
+        with self._cache_lock:
+            self._response_cache[prompt] = response_text
+            if len(self._response_cache) > self.cache_size:
+                self._response_cache.popitem(last=False)
+
+    def _resolve_retries(self, max_retries: int = None) -> int:
+        """Attempts for one request: the per-call value, else the default; must be >= 1"""
+        if max_retries is None:
+            return self.max_retries
+        if max_retries < 1:
+            raise ValueError(f"max_retries must be at least 1, got {max_retries}")
+        return max_retries
+
+    def _generate_with_retries(self, prompt: str, max_retries: int) -> str:
+        """Call the model, retrying retriable failures with jittered exponential backoff"""
         for attempt in range(max_retries):
             try:
                 response = self.model.generate_content(prompt)
+                return self._extract_text(response)
 
-                # Check if response was blocked or has no content
-                if not response.candidates:
-                    raise ValueError("No response candidates returned by the model")
+            except Exception as e:
+                wait_time = self._retry_wait(e, attempt, max_retries)
+                if wait_time is None:
+                    raise
+                time.sleep(wait_time)
 
-                # Check finish reason
-                candidate = response.candidates[0]
+    def _is_retriable(self, error: Exception) -> bool:
+        """Rate limits, 5xx, timeouts and transport errors are retriable; 4xx and blocked responses are not"""
+        if isinstance(error, ResponseBlockedError):
+            return False
+        if isinstance(error, self._api_error):
+            return isinstance(error, self._retriable_errors)
+        return True
 
-                # Try to safely get the text
-                try:
-                    response_text = response.text
-                except ValueError:
-                    # No text available
-                    response_text = None
-
-                if candidate.finish_reason == 1:  # STOP - successful completion
-                    if response_text:
-                        return response_text.strip()
-                    else:
-                        raise ValueError("Response completed but no text returned")
-                elif candidate.finish_reason == 2:  # MAX_TOKENS
-                    if response_text:
-                        return response_text.strip() + "... [Response truncated due to length]"
-                    else:
-                        raise ValueError("Response hit token limit. Try asking a shorter question or increase LLM_MAX_TOKENS in .env")
-                elif candidate.finish_reason == 3:  # SAFETY
-                    raise ValueError("Response blocked by safety filters. Try rephrasing the question.")
-                elif candidate.finish_reason == 4:  # RECITATION
-                    raise ValueError("Response blocked due to recitation concerns")
-                elif candidate.finish_reason == 5:  # OTHER
-                    raise ValueError("Response generation stopped for unknown reason")
-                else:
-                    # Fallback - try to get text anyway
-                    if response_text:
-                        return response_text.strip()
-                    else:
-                        raise ValueError(f"Unexpected finish_reason: {candidate.finish_reason}")
+    def _retry_wait(self, error: Exception, attempt: int, max_retries: int):
+        """
+        Seconds to wait before the next attempt, or None to give up
+
+        Honours a server-provided retry delay when the error carries one,
+        otherwise uses min(base * 2**attempt, max) plus up to 1s of jitter so
+        concurrent callers do not retry in lockstep.
+        """
+        if not self._is_retriable(error):
+            logger.error("Non-retriable error: %s", error)
+            return None
+        if attempt >= max_retries - 1:
+            logger.error("All %d attempts failed", max_retries)
+            return None
+
+        wait_time = self._server_retry_delay(error)
+        if wait_time is None:
+            wait_time = min(self.retry_base_delay * 2 ** attempt, self.retry_max_delay)
+            wait_time += random.uniform(0, 1)
+
+        logger.warning("Attempt %d failed: %s. Retrying in %.1fs...", attempt + 1, error, wait_time)
+        return wait_time
+
+    @staticmethod
+    def _server_retry_delay(error: Exception):
+        """Retry delay suggested by the API (e.g. on 429), in seconds, if present"""
+        delay = getattr(error, "retry_delay", None)
+        if delay is None:
+            return None
+        if hasattr(delay, "total_seconds"):  # datetime.timedelta
+            return delay.total_seconds()
+        if hasattr(delay, "seconds"):  # protobuf Duration
+            return delay.seconds + getattr(delay, "nanos", 0) / 1e9
+        try:
+            return float(delay)
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _extract_text(response) -> str:
+        """
+        Pull the answer text out of a response, honouring finish_reason
+
+        Raises:
+            ValueError: If the response was blocked or carries no usable text
+        """
+        # Check if response was blocked or has no content
+        if not response.candidates:
+            raise ValueError("No response candidates returned by the model")
+
+        # Check finish reason
+        candidate = response.candidates[0]
+
+        # Try to safely get the text
+        try:
+            response_text = response.text
+        except ValueError:
+            # No text available
+            response_text = None
+
+        if candidate.finish_reason == 1:  # STOP - successful completion
+            if response_text:
+                return response_text.strip()
+            else:
+                raise ValueError("Response completed but no text returned")
+        elif candidate.finish_reason == 2:  # MAX_TOKENS
+            if response_text:
+                return response_text.strip() + "... [Response truncated due to length]"
+            else:
+                raise ResponseBlockedError("Response hit token limit. Try asking a shorter question or increase LLM_MAX_TOKENS in .env")
+        elif candidate.finish_reason == 3:  # SAFETY
+            raise ResponseBlockedError("Response blocked by safety filters. Try rephrasing the question.")
+        elif candidate.finish_reason == 4:  # RECITATION
+            raise ResponseBlockedError("Response blocked due to recitation concerns")
+        elif candidate.finish_reason == 5:  # OTHER
+            raise ValueError("Response generation stopped for unknown reason")
+        else:
+            # Fallback - try to get text anyway
+            if response_text:
+                return response_text.strip()
+            else:
+                raise ValueError(f"Unexpected finish_reason: {candidate.finish_reason}")
+
+    def generate_stream(self, prompt: str, max_retries: int = None) -> Iterator[str]:
+        """
+        Stream the response as the model generates it
+
+        Opening the stream and reading its first chunk are retried like
+        generate(); once text has been yielded a failure is raised as-is.
 
+        Args:
+            prompt: The input prompt
+            max_retries: Number of attempts for retriable errors (default: self.max_retries)
+
+        Yields:
+            Text chunks in order
+
+        Raises:
+            ValueError: If the response was blocked or carries no usable text
+        """
+        chunks = self._open_stream_with_retries(prompt, self._resolve_retries(max_retries))
+
+        finish_reason = None
+        has_text = False
+        for chunk in chunks:
+            if chunk.candidates:
+                finish_reason = chunk.candidates[0].finish_reason
+
+            try:
+                text = chunk.text
+            except ValueError:
+                # No text in this chunk
+                text = None
+
+            if text:
+                has_text = True
+                yield text
+
+        # Same finish_reason handling as _extract_text
+        if finish_reason == 2:  # MAX_TOKENS
+            if not has_text:
+                raise ResponseBlockedError("Response hit token limit. Try asking a shorter question or increase LLM_MAX_TOKENS in .env")
+            yield "... [Response truncated due to length]"
+        elif finish_reason == 3:  # SAFETY
+            raise ResponseBlockedError("Response blocked by safety filters. Try rephrasing the question.")
+        elif finish_reason == 4:  # RECITATION
+            raise ResponseBlockedError("Response blocked due to recitation concerns")
+        elif finish_reason == 5:  # OTHER
+            raise ValueError("Response generation stopped for unknown reason")
+        elif not has_text:
+            raise ValueError("Response completed but no text returned")
+
+    def _open_stream_with_retries(self, prompt: str, max_retries: int) -> Iterator:
+        """
+        Start a streamed response, retrying until its first chunk arrives
+
+        Rate limits and transport errors surface either when the request is
+        sent or on the first chunk, so both are covered by the retry policy.
+
+        Returns:
+            Iterator over all response chunks, the first one included
+        """
+        for attempt in range(max_retries):
+            try:
+                chunks = iter(self.model.generate_content(prompt, stream=True))
+                first = next(chunks, None)
+                break
             except Exception as e:
-                if attempt < max_retries - 1:
-                    wait_time = 2 ** attempt  # Exponential backoff
-                    print(f"⚠️  Attempt {attempt + 1} failed: {e}")
-                    print(f"   Retrying in {wait_time}s...")
-                    time.sleep(wait_time)
-                else:
-                    print(f"❌ All {max_retries} attempts failed")
+                wait_time = self._retry_wait(e, attempt, max_retries)
+                if wait_time is None:
                     raise
+                time.sleep(wait_time)
+
+        if first is None:
+            return chunks
+        return itertools.chain([first], chunks)
 
     @staticmethod
     def list_available_models():
         """List all available Gemini models that support content generation"""
+        import google.generativeai as genai
+
         print("Available Gemini models:")
         print("-" * 80)
         for model in genai.list_models():
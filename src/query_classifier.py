@@ -47,6 +47,15 @@ class QueryClassifier:
         "information from document", "data from pdf",
     ]
 
+    # All triggers compiled into one alternation so a query is scanned once
+    # in C rather than with ~50 Python-level `in` checks. Word boundaries stop
+    # partial-word hits ("the filesystem" no longer matches "the file") while
+    # an optional plural suffix keeps "my documents" and "in pdfs" matching.
+    _TRIGGER_RE = re.compile(
+        r"\b(?:" + "|".join(re.escape(trigger) for trigger in RAG_TRIGGERS) + r")(?:s|es)?\b",
+        re.IGNORECASE
+    )
+
     def __init__(self):
         """Initialize the query classifier"""
         pass
@@ -61,12 +70,9 @@ class QueryClassifier:
         Returns:
             QueryType: "rag" if trigger detected, "llm" otherwise
         """
-        query_lower = query.lower().strip()
-
-        # Check if query contains any RAG trigger phrases
-        for trigger in self.RAG_TRIGGERS:
-            if trigger in query_lower:
-                return "rag"
+        # Check if query contains any RAG trigger phrase as whole words
+        if self._TRIGGER_RE.search(query):
+            return "rag"
 
         # Default to LLM (normal conversational AI)
         return "llm"
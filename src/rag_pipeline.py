@@ -4,22 +4,93 @@ RAG Pipeline Module
 This module orchestrates the complete RAG pipeline: retrieval + generation.
 """
 
-from typing import Dict, List
+import asyncio
+import copy
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Static parts of the RAG prompt; only the context and question vary per call
+_PROMPT_HEADER = (
+    "You are an expert AI assistant analyzing documents to provide accurate, comprehensive answers.\n"
+    "\n"
+    "DOCUMENT CONTEXT:\n"
+)
+_PROMPT_MIDDLE = "\n\nUSER QUESTION: "
+_PROMPT_FOOTER = (
+    "\n"
+    "\n"
+    "INSTRUCTIONS FOR YOUR RESPONSE:\n"
+    "1. Carefully analyze all the provided document context above\n"
+    "2. Provide a clear, well-structured answer that directly addresses the user's question\n"
+    "3. If multiple sources contain relevant information, synthesize them into a coherent response\n"
+    "4. Use natural, conversational language while maintaining accuracy\n"
+    "5. Explain concepts clearly - don't just extract text, but help the user understand\n"
+    "6. After your answer, cite the specific sources you used in the format: (Source 1, Source 2, etc.)\n"
+    "7. If the context doesn't contain sufficient information to fully answer the question, acknowledge this honestly\n"
+    "8. Focus on being helpful and informative rather than overly brief\n"
+    "\n"
+    "Please provide your comprehensive answer now:"
+)
 
 
 class RAGPipeline:
     """Complete RAG pipeline combining retrieval and generation"""
 
-    def __init__(self, retriever, llm):
+    _NO_RESULTS_ANSWER = "I couldn't find relevant information to answer this question."
+
+    def __init__(
+        self,
+        retriever,
+        llm,
+        cache_size: int = 512,
+        sem_threshold: float = 0.95,
+        sem_cache_size: int = 0,
+        min_similarity: float = 0.25
+    ):
         """
         Initialize the RAG pipeline
 
         Args:
             retriever: RAGRetriever instance for document retrieval
             llm: GeminiLLM instance for answer generation
+            cache_size: Number of answers kept for repeated identical
+                questions (0 disables the cache)
+            sem_threshold: Cosine similarity at which a previous question's
+                answer is reused for a paraphrase
+            sem_cache_size: Number of question embeddings kept for the
+                semantic cache (0, the default, disables it; a paraphrase
+                hit returns another question's answer, so it is opt-in)
+            min_similarity: Skip the LLM call and answer "not found" when the
+                best retrieved chunk scores below this similarity
         """
         self.retriever = retriever
         self.llm = llm
+        self.min_similarity = min_similarity
+
+        # LRU cache of answer dicts keyed on (normalized query, top_k, model)
+        self._cache: "OrderedDict[str, dict]" = OrderedDict()
+        self._cache_max = cache_size
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._cache_lock = threading.Lock()
+
+        # Semantic cache: ring buffer of normalized question embeddings (FIFO
+        # eviction), with the answer and top_k stored per row
+        self.sem_threshold = sem_threshold
+        self._sem_cache_size = sem_cache_size
+        self._sem_cache_vecs: np.ndarray = None  # allocated on first insert
+        self._sem_cache_top_k = np.zeros(sem_cache_size, dtype=np.int32)
+        self._sem_cache_answers: List[dict] = [None] * sem_cache_size
+        self._sem_count = 0  # rows filled
+        self._sem_next = 0   # row the next insert overwrites
+        self._sem_hits = 0
 
     def answer(self, query: str, top_k: int = 3) -> Dict:
         """
@@ -32,83 +103,416 @@ class RAGPipeline:
         Returns:
             Dictionary with answer, sources, and metadata
         """
-        print(f"📝 Query: {query}")
-        print(f"🔍 Retrieving top {top_k} relevant chunks...\n")
+        cached, key, query_embedding = self._lookup_cache(query, top_k)
+        if cached is not None:
+            return cached
+
+        logger.info("Query: %s (top %d chunks)", query, top_k)
 
         # Step 1: Retrieve relevant documents
-        results = self.retriever.retrieve(query, top_k=top_k)
+        results = self.retriever.retrieve(query, top_k=top_k, query_embedding=query_embedding)
 
-        if not results:
+        if not self._has_relevant(results):
             return {
-                "answer": "I couldn't find relevant information to answer this question.",
+                "answer": self._NO_RESULTS_ANSWER,
                 "sources": [],
                 "context_used": ""
             }
 
         # Step 2: Build context from retrieved chunks
-        context_parts = []
-        for i, doc_dict in enumerate(results, 1):
-            content = doc_dict['content']
-            metadata = doc_dict['metadata']
-            source = metadata.get('source', 'Unknown')
-            page = metadata.get('page', 'N/A')
-            similarity = doc_dict['similarity_score']
-
-            context_parts.append(f"[Source {i}: {source}, Page {page}]\n{content}")
-            print(f"📄 Source {i}: {source} (Page {page}) - Similarity: {similarity:.1%}")
-
-        context = "\n\n".join(context_parts)
+        context, sources = self._build_context(results)
 
         # Step 3: Build RAG prompt
         prompt = self._build_prompt(context, query)
 
         # Step 4: Generate answer
-        print(f"\n🤖 Generating answer with Gemini...\n")
+        logger.debug("Generating answer with Gemini")
         answer = self.llm.generate(prompt)
 
-        return {
+        result = {
             "answer": answer,
-            "sources": [
-                {
-                    "source": doc_dict['metadata'].get('source', 'Unknown'),
-                    "page": doc_dict['metadata'].get('page', 'N/A'),
-                    "similarity": doc_dict['similarity_score'],
-                    "content": doc_dict['content'][:200] + "..."  # Preview
-                }
-                for doc_dict in results
-            ],
+            "sources": sources,
             "context_used": context
         }
+        self._store_cache(key, query_embedding, top_k, result)
+        return result
 
-    def _build_prompt(self, context: str, query: str) -> str:
+    def answer_stream(self, query: str, top_k: int = 3) -> Iterator[Dict]:
         """
-        Build the RAG prompt with context and query
+        RAG pipeline that streams the answer as Gemini generates it
+
+        Sources are known before the LLM call, so they are yielded first.
 
         Args:
-            context: Retrieved context from documents
             query: User's question
+            top_k: Number of relevant chunks to retrieve
+
+        Yields:
+            {"type": "sources", "sources": [...], "context_used": str}, then
+            {"type": "token", "text": str} per chunk, then
+            {"type": "done", "answer": str} with the full answer
+        """
+        cached, key, query_embedding = self._lookup_cache(query, top_k)
+        if cached is not None:
+            yield {"type": "sources", "sources": cached["sources"], "context_used": cached["context_used"]}
+            yield {"type": "token", "text": cached["answer"]}
+            yield {"type": "done", "answer": cached["answer"]}
+            return
+
+        results = self.retriever.retrieve(query, top_k=top_k, query_embedding=query_embedding)
+
+        if not self._has_relevant(results):
+            yield {"type": "sources", "sources": [], "context_used": ""}
+            yield {"type": "token", "text": self._NO_RESULTS_ANSWER}
+            yield {"type": "done", "answer": self._NO_RESULTS_ANSWER}
+            return
+
+        context, sources = self._build_context(results)
+        yield {"type": "sources", "sources": sources, "context_used": context}
+
+        chunks = []
+        for text in self.llm.generate_stream(self._build_prompt(context, query)):
+            chunks.append(text)
+            yield {"type": "token", "text": text}
+
+        answer = "".join(chunks).strip()
+        self._store_cache(key, query_embedding, top_k, {
+            "answer": answer,
+            "sources": sources,
+            "context_used": context
+        })
+        yield {"type": "done", "answer": answer}
+
+    def _lookup_cache(self, query: str, top_k: int) -> Tuple[Optional[Dict], str, Optional[np.ndarray]]:
+        """
+        Check the exact-match then the semantic cache
 
         Returns:
-            Formatted prompt string
+            (copy of cached answer or None, exact cache key, normalized query
+            embedding when the semantic cache is enabled, for reuse in retrieval)
         """
-        return f"""You are an expert AI assistant analyzing documents to provide accurate, comprehensive answers.
+        key = self._cache_key(query, top_k)
+        if self._cache_max:
+            with self._cache_lock:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    self._cache_hits += 1
+                    return copy.deepcopy(cached), key, None
+                self._cache_misses += 1
+
+        # Paraphrase lookup; the embedding is reused for retrieval on a miss
+        query_embedding = None
+        if self._sem_cache_size:
+            query_embedding = self._normalize(self.retriever.embed_query(query))
+            cached = self._semantic_lookup(query_embedding, top_k)
+            if cached is not None:
+                return cached, key, query_embedding
+
+        return None, key, query_embedding
+
+    def _store_cache(self, key: str, query_embedding: Optional[np.ndarray], top_k: int, result: Dict):
+        """Record a generated answer in both caches (empty answers are never cached)"""
+        if not result.get("answer"):
+            return
+
+        if self._cache_max:
+            with self._cache_lock:
+                self._cache[key] = copy.deepcopy(result)
+                if len(self._cache) > self._cache_max:
+                    self._cache.popitem(last=False)
+
+        if query_embedding is not None:
+            self._semantic_store(query_embedding, top_k, result)
+
+    @staticmethod
+    def _normalize(vector: np.ndarray) -> np.ndarray:
+        """L2-normalize a vector as float32"""
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _semantic_lookup(self, query_embedding: np.ndarray, top_k: int):
+        """Copy of the cached answer for the most similar earlier question, or None"""
+        with self._cache_lock:
+            if not self._sem_count:
+                return None
+
+            n = self._sem_count
+            sims = self._sem_cache_vecs[:n] @ query_embedding
+            sims[self._sem_cache_top_k[:n] != top_k] = -1.0
+            best = int(np.argmax(sims))
+            if sims[best] < self.sem_threshold:
+                return None
+
+            self._sem_hits += 1
+            return copy.deepcopy(self._sem_cache_answers[best])
+
+    def _semantic_store(self, query_embedding: np.ndarray, top_k: int, result: Dict):
+        """Insert a question embedding and its answer, overwriting the oldest row when full"""
+        with self._cache_lock:
+            if self._sem_cache_vecs is None:
+                self._sem_cache_vecs = np.zeros(
+                    (self._sem_cache_size, query_embedding.shape[0]), dtype=np.float32
+                )
+
+            row = self._sem_next
+            self._sem_cache_vecs[row] = query_embedding
+            self._sem_cache_top_k[row] = top_k
+            self._sem_cache_answers[row] = copy.deepcopy(result)
 
-DOCUMENT CONTEXT:
-{context}
+            self._sem_next = (row + 1) % self._sem_cache_size
+            self._sem_count = min(self._sem_count + 1, self._sem_cache_size)
 
-USER QUESTION: {query}
+    def _cache_key(self, query: str, top_k: int) -> str:
+        """Cache key for a question; includes top_k and model so configs don't collide"""
+        raw = f"{self.llm.model_name}\x00{top_k}\x00{query.strip().lower()}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def clear_cache(self):
+        """Drop all cached answers (call after the collection changes)"""
+        with self._cache_lock:
+            self._cache.clear()
+            self._sem_cache_answers = [None] * self._sem_cache_size
+            self._sem_count = 0
+            self._sem_next = 0
+
+    def cache_stats(self) -> Dict:
+        """Answer cache counters"""
+        with self._cache_lock:
+            return {
+                "size": len(self._cache),
+                "max_size": self._cache_max,
+                "hits": self._cache_hits,
+                "misses": self._cache_misses,
+                "semantic_size": self._sem_count,
+                "semantic_hits": self._sem_hits,
+            }
+
+    def answer_batch(self, queries: List[str], top_k: int = 3) -> List[Dict]:
+        """
+        Answer several questions, overlapping the Gemini calls
+
+        Synchronous wrapper around aanswer_batch (runs its own event loop).
+
+        Args:
+            queries: User questions
+            top_k: Number of relevant chunks to retrieve per question
+
+        Returns:
+            One result dictionary per query, in the same order (see answer())
+        """
+        if not queries:
+            return []
+        return asyncio.run(self.aanswer_batch(queries, top_k=top_k))
+
+    async def aanswer_batch(self, queries: List[str], top_k: int = 3) -> List[Dict]:
+        """
+        Answer several questions concurrently
 
-INSTRUCTIONS FOR YOUR RESPONSE:
-1. Carefully analyze all the provided document context above
-2. Provide a clear, well-structured answer that directly addresses the user's question
-3. If multiple sources contain relevant information, synthesize them into a coherent response
-4. Use natural, conversational language while maintaining accuracy
-5. Explain concepts clearly - don't just extract text, but help the user understand
-6. After your answer, cite the specific sources you used in the format: (Source 1, Source 2, etc.)
-7. If the context doesn't contain sufficient information to fully answer the question, acknowledge this honestly
-8. Focus on being helpful and informative rather than overly brief
+        Cached answers are served first, as in answer(); repeats within the
+        batch are answered once. One embedding pass and one vector store call
+        cover the remaining queries (run in a worker thread so the event loop
+        stays free), then every prompt is sent to Gemini at once via
+        llm.agenerate.
 
-Please provide your comprehensive answer now:"""
+        Args:
+            queries: User questions
+            top_k: Number of relevant chunks to retrieve per question
+
+        Returns:
+            One result dictionary per query, in the same order (see answer())
+        """
+        lookups = await asyncio.to_thread(
+            lambda: [self._lookup_cache(query, top_k) for query in queries]
+        )
+
+        outputs: List[Dict] = [None] * len(queries)
+        misses = {}      # cache key -> (index of first occurrence, query embedding)
+        duplicates = []  # (index, index of first occurrence) for repeated misses
+        for i, (cached, key, query_embedding) in enumerate(lookups):
+            if cached is not None:
+                outputs[i] = cached
+            elif key in misses:
+                duplicates.append((i, misses[key][0]))
+            else:
+                misses[key] = (i, query_embedding)
+
+        miss_indices = [i for i, _ in misses.values()]
+        results_per_query = await asyncio.to_thread(
+            self.retriever.retrieve_batch, [queries[i] for i in miss_indices], top_k
+        )
+
+        pending = []  # (index, key, context, sources, prompt) for queries that found context
+        for (key, (i, _)), results in zip(misses.items(), results_per_query):
+            if not self._has_relevant(results):
+                outputs[i] = {
+                    "answer": self._NO_RESULTS_ANSWER,
+                    "sources": [],
+                    "context_used": ""
+                }
+                continue
+            context, sources = self._build_context(results)
+            pending.append((i, key, context, sources, self._build_prompt(context, queries[i])))
+
+        answers = await asyncio.gather(*(self.llm.agenerate(prompt) for *_, prompt in pending))
+        for (i, key, context, sources, _), answer in zip(pending, answers):
+            outputs[i] = {
+                "answer": answer,
+                "sources": sources,
+                "context_used": context
+            }
+            self._store_cache(key, misses[key][1], top_k, outputs[i])
+
+        for i, first in duplicates:
+            outputs[i] = copy.deepcopy(outputs[first])
+
+        return outputs
+
+    async def answer_stream_pipelined(
+        self,
+        queries: AsyncIterator[str],
+        top_k: int = 3,
+        max_prefetch: int = 4
+    ) -> AsyncIterator[Dict]:
+        """
+        Answer a stream of questions with retrieval and generation overlapped
+
+        A retrieval stage (embedding + ChromaDB, in a worker thread) works
+        ahead of the generation stage (Gemini calls) through a bounded
+        queue, so local compute and network round trips run at the same
+        time. Answers are yielded as they complete, not in input order.
+
+        Args:
+            queries: Async iterator of user questions
+            top_k: Number of relevant chunks to retrieve per question
+            max_prefetch: Retrieved questions that may wait for generation
+
+        Yields:
+            Result dictionaries as in answer(), plus "index" (position in
+            the input stream) and "query"
+        """
+        prepared: asyncio.Queue = asyncio.Queue(maxsize=max_prefetch)
+        end_of_stream = object()
+        max_in_flight = getattr(self.llm, "max_concurrency", 10)
+
+        async def retrieve_stage():
+            # The end marker is sent on completion and on errors, but not on
+            # cancellation (CancelledError is not an Exception): by then the
+            # consumer has stopped reading, so a put into a full queue would
+            # never return
+            try:
+                index = 0
+                async for query in queries:
+                    results = await asyncio.to_thread(self.retriever.retrieve, query, top_k)
+                    await prepared.put((index, query, results))
+                    index += 1
+            except Exception:
+                await prepared.put(end_of_stream)
+                raise
+            await prepared.put(end_of_stream)
+
+        async def generate_stage(index: int, query: str, results: List[Dict]) -> Dict:
+            if not self._has_relevant(results):
+                answer, sources, context = self._NO_RESULTS_ANSWER, [], ""
+            else:
+                context, sources = self._build_context(results)
+                answer = await self.llm.agenerate(self._build_prompt(context, query))
+            return {
+                "index": index,
+                "query": query,
+                "answer": answer,
+                "sources": sources,
+                "context_used": context
+            }
+
+        retriever_task = asyncio.create_task(retrieve_stage())
+        getter = None
+        in_flight = set()
+        exhausted = False
+        try:
+            while not exhausted or in_flight:
+                # Only pull more work while Gemini has spare concurrency
+                if getter is None and not exhausted and len(in_flight) < max_in_flight:
+                    getter = asyncio.create_task(prepared.get())
+
+                waiting = in_flight | {getter} if getter is not None else in_flight
+                done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+
+                if getter in done:
+                    item = getter.result()
+                    getter = None
+                    if item is end_of_stream:
+                        exhausted = True
+                    else:
+                        in_flight.add(asyncio.create_task(generate_stage(*item)))
+
+                for task in done & in_flight:
+                    in_flight.discard(task)
+                    yield task.result()
+
+            # Surface errors raised while reading or retrieving queries
+            await retriever_task
+        finally:
+            for task in (retriever_task, getter, *in_flight):
+                if task is not None:
+                    task.cancel()
+
+    def _has_relevant(self, results: List[Dict]) -> bool:
+        """True when the best retrieved chunk clears min_similarity (worth an LLM call)"""
+        if not results:
+            return False
+        best = max(doc_dict['similarity_score'] for doc_dict in results)
+        if best < self.min_similarity:
+            logger.info("Best similarity %.3f below %.2f; skipping generation", best, self.min_similarity)
+            return False
+        return True
+
+    @staticmethod
+    def _build_context(results: List[Dict]) -> Tuple[str, List[Dict]]:
+        """
+        Build the prompt context and the source previews in one pass over results
+
+        Args:
+            results: Retrieved chunks from RAGRetriever.retrieve
+
+        Returns:
+            (context string tagged with [Source i: ...], list of source dicts)
+        """
+        context_parts = [None] * len(results)
+        sources = [None] * len(results)
+        log_sources = logger.isEnabledFor(logging.DEBUG)
+        for i, doc_dict in enumerate(results, 1):
+            content = doc_dict['content']
+            metadata = doc_dict['metadata']
+            source = metadata.get('source', 'Unknown')
+            page = metadata.get('page', 'N/A')
+            similarity = doc_dict['similarity_score']
+
+            context_parts[i - 1] = f"[Source {i}: {source}, Page {page}]\n{content}"
+            sources[i - 1] = {
+                "source": source,
+                "page": page,
+                "similarity": similarity,
+                "content": content if len(content) <= 200 else content[:200] + "..."  # Preview
+            }
+            if log_sources:
+                logger.debug("Source %d: %s (Page %s) sim=%.3f", i, source, page, similarity)
+
+        return "\n\n".join(context_parts), sources
+
+    def _build_prompt(self, context: str, query: str) -> str:
+        """
+        Build the RAG prompt with context and query
+
+        Args:
+            context: Retrieved context from documents
+            query: User's question
+
+        Returns:
+            Formatted prompt string
+        """
+        return "".join((_PROMPT_HEADER, context, _PROMPT_MIDDLE, query, _PROMPT_FOOTER))
 
     def display_result(self, result: Dict):
         """
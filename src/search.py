@@ -4,28 +4,67 @@ Search/Retrieval Module
 This module handles query-based retrieval from the vector store.
 """
 
-from typing import List, Dict, Any
+import functools
+import logging
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
 
 
 class RAGRetriever:
     """Handles query-based retrieval from the vector store"""
 
-    def __init__(self, vector_store, embedding_manager):
+    def __init__(self, vector_store, embedding_manager, batcher=None, query_cache_size: int = 256):
         """
         Initialize the retriever
 
         Args:
             vector_store: VectorStore instance containing document embeddings
             embedding_manager: EmbeddingManager instance for generating query embeddings
+            batcher: Optional EmbeddingBatcher that coalesces concurrent query embeddings
+            query_cache_size: Number of query embeddings kept in an in-memory
+                LRU (0 disables it)
         """
         self.vector_store = vector_store
         self.embedding_manager = embedding_manager
+        self.batcher = batcher
+
+        # Repeated questions skip the embedding forward pass
+        self._embed_cached = (
+            functools.lru_cache(maxsize=query_cache_size)(self._embed_query_uncached)
+            if query_cache_size else self._embed_query_uncached
+        )
+
+    def embed_query(self, query: str) -> np.ndarray:
+        """
+        Embed a query (unit-normalized like the stored document embeddings)
+
+        Args:
+            query: The search query
+
+        Returns:
+            Read-only float32 vector with shape (embedding_dim,); it may be
+            shared with later calls for the same query
+        """
+        return self._embed_cached(query)
+
+    def _embed_query_uncached(self, query: str) -> np.ndarray:
+        if self.batcher is not None:
+            embedding = self.batcher.embed_one(query).result()
+        else:
+            embedding = self.embedding_manager.generate_embeddings([query], show_progress=False)[0]
+        # Cached arrays are shared between callers, so make them immutable
+        embedding.setflags(write=False)
+        return embedding
 
     def retrieve(
         self,
         query: str,
         top_k: int = 5,
-        score_threshold: float = 0.0
+        score_threshold: float = 0.0,
+        query_embedding: Optional[np.ndarray] = None
     ) -> List[Dict[str, Any]]:
         """
         Retrieve relevant documents for a query
@@ -34,54 +73,106 @@ class RAGRetriever:
             query: The search query
             top_k: Number of top results to return
             score_threshold: Minimum similarity score threshold
+            query_embedding: Precomputed embed_query(query), if the caller has it
 
         Returns:
             List of dictionaries containing retrieved documents and metadata
         """
-        print(f"Retrieving documents for query: '{query}'")
-        print(f"Top K: {top_k}, Score threshold: {score_threshold}")
+        logger.debug("Retrieving documents for query: %r (top_k=%d, threshold=%s)", query, top_k, score_threshold)
 
-        # Generate query embedding
-        query_embedding = self.embedding_manager.generate_embeddings([query], show_progress=False)[0]
+        if query_embedding is None:
+            query_embedding = self.embed_query(query)
 
         # Search in vector store
         try:
-            results = self.vector_store.collection.query(
-                query_embeddings=[query_embedding.tolist()],
-                n_results=top_k
-            )
-
-            # Process results
-            retrieved_docs = []
-
-            if results['documents'] and results['documents'][0]:
-                documents = results['documents'][0]
-                metadatas = results['metadatas'][0]
-                distances = results['distances'][0]
-                ids = results['ids'][0]
-
-                for i, (doc_id, document, metadata, distance) in enumerate(
-                    zip(ids, documents, metadatas, distances)
-                ):
-                    # Convert distance to similarity score (ChromaDB uses cosine distance)
-                    similarity_score = 1 - distance
-
-                    if similarity_score >= score_threshold:
-                        retrieved_docs.append({
-                            'id': doc_id,
-                            'content': document,
-                            'metadata': metadata,
-                            'similarity_score': similarity_score,
-                            'distance': distance,
-                            'rank': i + 1
-                        })
-
-                print(f"Retrieved {len(retrieved_docs)} documents (after filtering)")
+            if getattr(self.vector_store, "int8_index", None) is not None:
+                # Short-list with the int8 shadow index, re-score in float32
+                results = self.vector_store.query_int8(query_embedding, n_results=top_k)
             else:
-                print("No documents found")
+                results = self.vector_store.query(query_embedding, n_results=top_k)
+
+            retrieved_docs = self._format_results(results, 0, score_threshold)
+            logger.debug("Retrieved %d documents (after filtering)", len(retrieved_docs))
 
             return retrieved_docs
 
         except Exception as e:
-            print(f"Error during retrieval: {e}")
+            logger.error("Error during retrieval: %s", e)
             return []
+
+    def retrieve_batch(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        score_threshold: float = 0.0
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Retrieve relevant documents for several queries at once
+
+        All queries are embedded in one forward pass and searched with one
+        vector store call.
+
+        Args:
+            queries: The search queries
+            top_k: Number of top results to return per query
+            score_threshold: Minimum similarity score threshold
+
+        Returns:
+            One list of retrieved documents per query, in the same order
+        """
+        if not queries:
+            return []
+
+        logger.debug("Retrieving documents for %d queries (top_k=%d)", len(queries), top_k)
+
+        query_embeddings = self.embedding_manager.generate_embeddings(queries, show_progress=False)
+
+        try:
+            if getattr(self.vector_store, "int8_index", None) is not None:
+                # The int8 path re-scores per query
+                return [
+                    self._format_results(
+                        self.vector_store.query_int8(embedding, n_results=top_k), 0, score_threshold
+                    )
+                    for embedding in query_embeddings
+                ]
+
+            results = self.vector_store.query(query_embeddings, n_results=top_k)
+            return [
+                self._format_results(results, i, score_threshold)
+                for i in range(len(queries))
+            ]
+
+        except Exception as e:
+            logger.error("Error during retrieval: %s", e)
+            return [[] for _ in queries]
+
+    def _format_results(self, results: Dict[str, list], query_index: int, score_threshold: float) -> List[Dict[str, Any]]:
+        """Turn the query_index-th entry of a collection.query() result into retrieved doc dicts"""
+        retrieved_docs = []
+
+        if not (results['documents'] and results['documents'][query_index]):
+            return retrieved_docs
+
+        documents = results['documents'][query_index]
+        metadatas = results['metadatas'][query_index]
+        distances = results['distances'][query_index]
+        ids = results['ids'][query_index]
+
+        for i, (doc_id, document, metadata, distance) in enumerate(
+            zip(ids, documents, metadatas, distances)
+        ):
+            # Convert distance to similarity score for the collection's space
+            similarity_score = self.vector_store.similarity(distance)
+
+            if similarity_score >= score_threshold:
+                retrieved_docs.append({
+                    'id': doc_id,
+                    'content': document,
+                    'metadata': metadata,
+                    'similarity_score': similarity_score,
+                    'distance': distance,
+                    'rank': i + 1
+                })
+
+        return retrieved_docs
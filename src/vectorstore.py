@@ -5,10 +5,124 @@ This module manages document embeddings in a ChromaDB vector store.
 """
 
 import os
+import shutil
+import threading
 import uuid
-from typing import List, Any
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Any, Dict, Optional
 import numpy as np
-import chromadb
+
+from .embedding import EmbeddingManager
+
+
+def _chroma_accepts_numpy(version: str) -> bool:
+    """ChromaDB validates numpy embedding arrays from 0.5; 0.4.x requires lists"""
+    try:
+        major, minor = (int(part) for part in version.split(".")[:2])
+    except ValueError:
+        return False
+    return (major, minor) >= (0, 5)
+
+
+class Int8ShadowIndex:
+    """
+    In-memory int8 copy of a collection's embeddings for candidate short-listing
+
+    Stored as parallel arrays (ids, int8 codes, float32 row scales), 4x
+    smaller than the float32 vectors. Each add_documents batch is persisted
+    as one .npz file so the index survives restarts without rewriting.
+    """
+
+    # Rows converted to float32 per block during a scan (bounds temporary memory)
+    _SCAN_BLOCK = 65536
+
+    def __init__(self, directory: Path):
+        """
+        Args:
+            directory: Directory holding this collection's .npz batches
+        """
+        self.directory = Path(directory)
+        # One entry per added batch; concatenated lazily on the next scan, so
+        # a long ingest appends in O(1) instead of copying the index per batch
+        self._id_blocks: List[List[str]] = []
+        self._code_blocks: List[np.ndarray] = []
+        self._scale_blocks: List[np.ndarray] = []
+        self._size = 0
+        # add() runs on the ingest thread while queries scan concurrently;
+        # the three block lists must always change together
+        self._lock = threading.Lock()
+        self._load()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _load(self):
+        """Load all persisted batches"""
+        if not self.directory.exists():
+            return
+        for part in sorted(self.directory.glob("*.npz")):
+            with np.load(part) as data:
+                self._append(data["ids"].tolist(), data["codes"], data["scales"])
+
+    def _append(self, ids: List[str], codes: np.ndarray, scales: np.ndarray):
+        with self._lock:
+            self._id_blocks.append(list(ids))
+            self._code_blocks.append(codes)
+            self._scale_blocks.append(scales)
+            self._size += len(ids)
+
+    def _consolidate(self):
+        """Merge the pending batches into a single block (caller holds self._lock)"""
+        if len(self._code_blocks) > 1:
+            self._id_blocks = [[doc_id for block in self._id_blocks for doc_id in block]]
+            self._code_blocks = [np.concatenate(self._code_blocks)]
+            self._scale_blocks = [np.concatenate(self._scale_blocks)]
+
+    def add(self, ids: List[str], embeddings: np.ndarray):
+        """Quantize and persist a batch of embeddings"""
+        codes, scales = EmbeddingManager.quantize_int8(embeddings)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        np.savez(self.directory / f"{uuid.uuid4().hex}.npz", ids=np.asarray(ids), codes=codes, scales=scales)
+        self._append(ids, codes, scales)
+
+    def shortlist(self, query_embedding: np.ndarray, k: int) -> List[str]:
+        """
+        Ids of the k rows with the highest approximate inner product
+
+        Args:
+            query_embedding: Float query vector with shape (embedding_dim,)
+            k: Number of candidates to return
+
+        Returns:
+            Candidate ids (unordered)
+        """
+        query = np.asarray(query_embedding, dtype=np.float32)
+        with self._lock:
+            if not self._size:
+                return []
+
+            self._consolidate()
+            ids, codes, row_scales = self._id_blocks[0], self._code_blocks[0], self._scale_blocks[0]
+
+            scores = np.empty(len(ids), dtype=np.float32)
+            for start in range(0, len(ids), self._SCAN_BLOCK):
+                block = codes[start:start + self._SCAN_BLOCK].astype(np.float32)
+                scores[start:start + self._SCAN_BLOCK] = block @ query
+            scores *= row_scales
+
+        k = min(k, len(ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        return [ids[i] for i in top]
+
+    def clear(self):
+        """Delete the persisted index and reset it"""
+        with self._lock:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self._id_blocks = []
+            self._code_blocks = []
+            self._scale_blocks = []
+            self._size = 0
 
 
 class VectorStore:
@@ -17,7 +131,9 @@ class VectorStore:
     def __init__(
         self,
         collection_name: str = "pdf_documents",
-        persist_directory: str = "../data/vector_store"
+        persist_directory: str = "../data/vector_store",
+        distance_space: str = "ip",
+        int8_index: bool = False
     ):
         """
         Initialize the vector store
@@ -25,25 +141,65 @@ class VectorStore:
         Args:
             collection_name: Name of the ChromaDB collection
             persist_directory: Directory to persist the vector store
+            distance_space: HNSW distance for new collections. "ip" (inner
+                product) ranks like cosine because EmbeddingManager always
+                emits unit vectors, without recomputing norms per comparison.
+                Existing collections keep the space they were created with.
+            int8_index: Keep an int8 shadow index for query_int8 short-listing
         """
         self.collection_name = collection_name
         self.persist_directory = persist_directory
+        self.distance_space = distance_space
+        # Space for newly created collections (distance_space is replaced by
+        # the opened collection's actual space)
+        self._requested_space = distance_space
         self.client = None
         self.collection = None
+        self._accepts_numpy = False
+        self.int8_index = (
+            Int8ShadowIndex(Path(persist_directory) / "int8" / collection_name)
+            if int8_index else None
+        )
         self._initialize_store()
 
     def _initialize_store(self):
         """Initialize ChromaDB client and collection"""
+        import chromadb
+
+        self._accepts_numpy = _chroma_accepts_numpy(chromadb.__version__)
         try:
             # Create persistent ChromaDB client
             os.makedirs(self.persist_directory, exist_ok=True)
             self.client = chromadb.PersistentClient(path=self.persist_directory)
 
-            # Get or create collection
-            self.collection = self.client.get_or_create_collection(
-                name=self.collection_name,
-                metadata={"description": "PDF document embeddings for RAG"}
+            # Open an existing collection without metadata: get_or_create
+            # would overwrite its "hnsw:space" label, while the HNSW index
+            # keeps the space it was built with
+            try:
+                self.collection = self.client.get_collection(name=self.collection_name)
+                created = False
+            except Exception:
+                # Not found (ValueError before ChromaDB 0.6, NotFoundError after)
+                self.collection = self.client.get_or_create_collection(
+                    name=self.collection_name,
+                    metadata={
+                        "description": "PDF document embeddings for RAG",
+                        "hnsw:space": self._requested_space
+                    }
+                )
+                created = True
+
+            # Existing collections keep the space they were created with
+            space = (
+                self._segment_space()
+                or (self.collection.metadata or {}).get("hnsw:space")
+                or "l2"
             )
+            if not created and space != self._requested_space:
+                print(f"Collection {self.collection_name} uses '{space}' distance "
+                      f"(requested '{self._requested_space}')")
+            self.distance_space = space
+
             print(f"Vector store initialized. Collection: {self.collection_name}")
             print(f"Existing documents in collection: {self.collection.count()}")
 
@@ -51,6 +207,26 @@ class VectorStore:
             print(f"Error initializing vector store: {e}")
             raise
 
+    def _segment_space(self) -> Optional[str]:
+        """
+        Distance space recorded on the collection's vector segment, or None
+
+        The segment's HNSW parameters are fixed when the index is built, so
+        they stay correct even if the collection metadata was relabelled.
+        Relies on ChromaDB internals, so any failure returns None.
+        """
+        try:
+            from chromadb.db.impl.sqlite import SqliteDB
+            from chromadb.types import SegmentScope
+            sysdb = self.client._system.instance(SqliteDB)
+            for segment in sysdb.get_segments(collection=self.collection.id, scope=SegmentScope.VECTOR):
+                space = (segment.get("metadata") or {}).get("hnsw:space")
+                if space:
+                    return space
+        except Exception:
+            pass
+        return None
+
     def add_documents(self, documents: List[Any], embeddings: np.ndarray):
         """
         Add documents and their embeddings to the vector store
@@ -64,37 +240,28 @@ class VectorStore:
 
         print(f"Adding {len(documents)} documents to vector store...")
 
-        # Prepare data for ChromaDB
-        ids = []
-        metadatas = []
-        documents_text = []
-        embeddings_list = []
-
-        for i, (doc, embedding) in enumerate(zip(documents, embeddings)):
-            # Generate unique ID
-            doc_id = f"doc_{uuid.uuid4().hex[:8]}_{i}"
-            ids.append(doc_id)
-
-            # Prepare metadata
-            metadata = dict(doc.metadata)
-            metadata['doc_index'] = i
-            metadata['content_length'] = len(doc.page_content)
-            metadatas.append(metadata)
+        # Prepare data for ChromaDB; one random prefix per call, so IDs stay
+        # unique without drawing from the OS CSPRNG per document
+        batch_id = uuid.uuid4().hex[:8]
+        ids = [f"doc_{batch_id}_{i}" for i in range(len(documents))]
+        documents_text = [doc.page_content for doc in documents]
 
-            # Document content
-            documents_text.append(doc.page_content)
-
-            # Embedding
-            embeddings_list.append(embedding.tolist())
+        # One dict merge per chunk; doc.metadata itself is left untouched
+        metadatas = [
+            {**doc.metadata, 'doc_index': i, 'content_length': len(text)}
+            for i, (doc, text) in enumerate(zip(documents, documents_text))
+        ]
 
         # Add to collection
         try:
             self.collection.add(
                 ids=ids,
-                embeddings=embeddings_list,
+                embeddings=self._to_chroma(embeddings),
                 metadatas=metadatas,
                 documents=documents_text
             )
+            if self.int8_index is not None:
+                self.int8_index.add(ids, np.asarray(embeddings))
             print(f"Successfully added {len(documents)} documents to vector store")
             print(f"Total documents in collection: {self.collection.count()}")
 
@@ -102,6 +269,163 @@ class VectorStore:
             print(f"Error adding documents to vector store: {e}")
             raise
 
+    def _to_chroma(self, embeddings: np.ndarray):
+        """
+        Embeddings in the form ChromaDB takes: the float32 array itself when
+        supported (no per-value Python floats), else one bulk tolist()
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        return embeddings if self._accepts_numpy else embeddings.tolist()
+
+    def similarity(self, distance: float) -> float:
+        """
+        Convert a distance from this collection into a cosine similarity
+
+        Embeddings are unit vectors, so "ip" and "cosine" distances are both
+        1 - cos, and "l2" (squared Euclidean) distance is 2 - 2 * cos.
+
+        Args:
+            distance: Distance returned by query() or query_int8()
+
+        Returns:
+            Cosine similarity in [-1, 1]
+        """
+        if self.distance_space == "l2":
+            return 1 - distance / 2
+        return 1 - distance
+
+    def _distance(self, similarity: float) -> float:
+        """Inverse of similarity(): a cosine similarity as a distance in this collection's space"""
+        if self.distance_space == "l2":
+            return 2 - 2 * similarity
+        return 1 - similarity
+
+    def query(self, query_embeddings: np.ndarray, n_results: int = 5) -> Dict[str, list]:
+        """
+        Query the collection with one or more embeddings in a single call
+
+        Args:
+            query_embeddings: Array with shape (n_queries, embedding_dim), or
+                a single vector with shape (embedding_dim,)
+            n_results: Number of results per query
+
+        Returns:
+            collection.query() results, one inner list per query
+        """
+        query_embeddings = np.asarray(query_embeddings, dtype=np.float32)
+        if query_embeddings.ndim == 1:
+            query_embeddings = query_embeddings[None, :]
+
+        return self.collection.query(
+            query_embeddings=self._to_chroma(query_embeddings),
+            n_results=n_results
+        )
+
+    def query_int8(
+        self,
+        query_embedding: np.ndarray,
+        n_results: int = 5,
+        shortlist_factor: int = 4
+    ) -> Dict[str, list]:
+        """
+        Query via the int8 shadow index, re-scoring candidates in float32
+
+        Short-lists n_results * shortlist_factor candidates from the int8
+        index, fetches their float embeddings from ChromaDB and ranks them
+        by exact inner product. Falls back to query() when the index row
+        count does not match the collection's.
+
+        Args:
+            query_embedding: Unit-normalized query vector
+            n_results: Number of results to return
+            shortlist_factor: Candidates fetched per returned result
+
+        Returns:
+            Results in the same shape as collection.query() for one query
+        """
+        if len(self.int8_index) != self.collection.count():
+            # Index is missing, incomplete or stale (e.g. rows deleted outside
+            # add_documents); fall back to the HNSW query
+            return self.query(query_embedding, n_results=n_results)
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        candidate_ids = self.int8_index.shortlist(query, n_results * shortlist_factor)
+        if not candidate_ids:
+            return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+
+        candidates = self.collection.get(
+            ids=candidate_ids,
+            include=["embeddings", "documents", "metadatas"]
+        )
+        scores = np.asarray(candidates["embeddings"], dtype=np.float32) @ query
+        order = np.argsort(-scores)[:n_results]
+
+        return {
+            "ids": [[candidates["ids"][i] for i in order]],
+            "documents": [[candidates["documents"][i] for i in order]],
+            "metadatas": [[candidates["metadatas"][i] for i in order]],
+            # Distances in the collection's own space, as query() returns them
+            "distances": [[float(self._distance(scores[i])) for i in order]],
+        }
+
+    def _sqlite_connection(self):
+        """
+        ChromaDB's SQLite connection for the current thread, or None
+
+        Relies on ChromaDB internals (per-thread connection pool), so any
+        failure just disables the PRAGMA tuning.
+        """
+        try:
+            from chromadb.db.impl.sqlite import SqliteDB
+            return self.client._system.instance(SqliteDB)._conn_pool.connect()
+        except Exception as e:
+            print(f"SQLite tuning unavailable for this ChromaDB version: {e}")
+            return None
+
+    @contextmanager
+    def bulk_ingest_mode(self, unsafe: bool = False):
+        """
+        Relax SQLite durability while adding documents, then restore it
+
+        Meant to wrap a whole ingest, not each batch: switching journal
+        modes needs exclusive access to the database. Applies to the
+        calling thread's connection, so enter it on the thread that inserts.
+
+        Default mode uses journal_mode=WAL with synchronous=NORMAL, which
+        stays crash-safe for the database but may lose the last commits on
+        power loss. unsafe=True turns journaling and fsync off entirely;
+        only use it when sources can be re-ingested.
+
+        Args:
+            unsafe: Use journal_mode=OFF and synchronous=OFF
+        """
+        conn = self._sqlite_connection()
+        if conn is None:
+            yield
+            return
+
+        try:
+            previous_journal = conn.execute("PRAGMA journal_mode").fetchone()[0]
+            previous_sync = conn.execute("PRAGMA synchronous").fetchone()[0]
+            conn.execute(f"PRAGMA journal_mode={'OFF' if unsafe else 'WAL'}")
+            conn.execute(f"PRAGMA synchronous={'OFF' if unsafe else 'NORMAL'}")
+        except Exception as e:
+            # e.g. "database is locked" while other connections are open
+            print(f"Could not relax SQLite durability, ingesting with defaults: {e}")
+            yield
+            return
+
+        try:
+            yield
+        finally:
+            # Leaving WAL needs exclusive access; a failed restore must not
+            # turn an insert that already succeeded into an error
+            for pragma in (f"synchronous={previous_sync}", f"journal_mode={previous_journal}"):
+                try:
+                    conn.execute(f"PRAGMA {pragma}")
+                except Exception as e:
+                    print(f"Could not restore SQLite PRAGMA {pragma}: {e}")
+
     def get_collection_stats(self) -> dict:
         """
         Get statistics about the collection
@@ -119,6 +443,8 @@ class VectorStore:
         """Delete all documents from the collection"""
         try:
             self.client.delete_collection(self.collection_name)
+            if self.int8_index is not None:
+                self.int8_index.clear()
             print(f"Deleted collection: {self.collection_name}")
             # Recreate empty collection
             self._initialize_store()